@@ -1,5 +1,10 @@
+import os
+
 if __name__ == "__main__":
-    from app import create_app  
-    app = create_app()
+    from app import create_app
+    from app.config import Config
+
+    # The reloader runs this file in a parent and a serving child; only the child runs the scheduler
+    app = create_app({"START_SCHEDULER": Config.START_SCHEDULER and os.getenv("WERKZEUG_RUN_MAIN") == "true"})
     
     app.run(debug=True)
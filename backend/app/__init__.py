@@ -6,6 +6,7 @@ from flask_jwt_extended import JWTManager
 from dotenv import load_dotenv
 import os
 from app.database import mongo
+from app.config import Config
 
 # Load environment variables
 load_dotenv()
@@ -14,14 +15,29 @@ load_dotenv()
 login_manager = LoginManager()
 jwt = JWTManager()
 
-def create_app():
+def _in_cli_command():
+    """True while `flask <command>` (other than `flask run`) loads the app, e.g. a maintenance command."""
+    import click
+    ctx = click.get_current_context(silent=True)
+    return ctx is not None and ctx.info_name != "run"
+
+def create_app(config=None):
     app = Flask(__name__)
     CORS(app)  # Enable Cross-Origin Resource Sharing
 
-    # Set Flask Config
+    # Set Flask Config (startup flags from Config, overridable per app)
+    app.config.from_object(Config)
     app.config["SECRET_KEY"] = os.getenv("SECRET_KEY")
     app.config["MONGO_URI"] = os.getenv("MONGO_URI")  # MongoDB URI from .env
     app.config["JWT_SECRET_KEY"] = os.getenv("JWT_SECRET_KEY")  # For JWT Authentication
+    if config:
+        app.config.update(config)
+
+    # Command listeners must be registered before the Mongo client is created
+    if app.config["METRICS_ENABLED"]:
+        from app.utils.metrics import init_metrics, register_mongo_listener
+        register_mongo_listener()
+        init_metrics(app)
 
     # Initialize extensions
     mongo.init_app(app)
@@ -32,14 +48,42 @@ def create_app():
     from app.routes.auth_routes import auth_bp
     from app.routes.profile_routes import profile_bp
     from app.routes.medication_routes import medication_bp
+    from app.routes.notification_route import notification_bp
+    from app.routes.caregiver_routes import caregiver_bp
 
     app.register_blueprint(auth_bp, url_prefix="/auth")
     app.register_blueprint(profile_bp, url_prefix="/profile")
     app.register_blueprint(medication_bp, url_prefix="/medication")
+    app.register_blueprint(notification_bp, url_prefix="/notifications")
+    app.register_blueprint(caregiver_bp, url_prefix="/caregiver")
+
+    # Register CLI maintenance commands
+    from app.commands import register_commands
+    register_commands(app)
+
+    # Declared indexes for every hot query (safe to run on every start)
+    if app.config["CREATE_INDEXES_ON_STARTUP"]:
+        from app.utils.indexes import ensure_indexes
+        with app.app_context():
+            ensure_indexes()
+
+    # Subsystems not started here are initialized lazily on first use
+    if app.config["LOAD_KEYS_ON_STARTUP"]:
+        from app.utils.encryption import load_keys
+        load_keys()
+
+    if app.config["INIT_FIREBASE_ON_STARTUP"]:
+        from app.utils.firebase_config import init_firebase
+        init_firebase()
+
+    if app.config["START_SCHEDULER"] and not _in_cli_command():
+        from app.utils.status_updater import start_scheduler
+        start_scheduler()
 
     # Define user loader for Flask-Login
     @login_manager.user_loader
     def load_user(user_id):
-        return mongo.db.users.find_one({"_id": user_id})  # Use ObjectId if needed
+        from app.utils.user_cache import get_user
+        return get_user(user_id)
 
     return app
@@ -0,0 +1,77 @@
+"""
+Async serving mode: the same URL surface on an ASGI stack.
+
+The hot auth, profile and medication read paths are native Quart views on an
+async Mongo client (motor), with decryption pushed to an executor and password
+hashing to the shared hashing pool so a worker keeps serving other requests
+during Mongo round trips and crypto. Every other route (medication writes, notifications, /metrics) falls
+through to the regular WSGI app, so clients cannot tell the modes apart.
+
+    uvicorn --factory app.asgi:create_asgi_app --workers 4
+"""
+import os
+from asgiref.wsgi import WsgiToAsgi
+from quart import Quart
+from quart_cors import cors
+from werkzeug.exceptions import MethodNotAllowed, NotFound
+from werkzeug.routing import RequestRedirect
+from app.config import Config
+
+
+class FallbackDispatcher:
+    """ASGI app serving routes the async app defines and handing everything else to `fallback`."""
+
+    def __init__(self, app, fallback):
+        self.app = app
+        self.fallback = fallback
+
+    def _matches(self, scope):
+        adapter = self.app.url_map.bind("")
+        try:
+            adapter.match(scope["path"], method=scope["method"])
+        except (NotFound, MethodNotAllowed):
+            return False
+        except RequestRedirect:
+            pass
+        return True
+
+    async def __call__(self, scope, receive, send):
+        # Lifespan events go to the async app, which owns the Mongo client
+        if scope["type"] == "http" and not self._matches(scope):
+            await self.fallback(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
+
+
+def create_asgi_app(config=None):
+    app = cors(Quart(__name__))  # Enable Cross-Origin Resource Sharing
+
+    app.config.from_object(Config)
+    app.config["SECRET_KEY"] = os.getenv("SECRET_KEY")
+    app.config["MONGO_URI"] = os.getenv("MONGO_URI")
+    if config:
+        app.config.update(config)
+
+    from app.asgi.database import amongo
+    from app.asgi.util import shutdown_executor
+    from app.asgi.auth_routes import auth_bp
+    from app.asgi.profile_routes import profile_bp
+    from app.asgi.medication_routes import medication_bp
+
+    app.register_blueprint(auth_bp, url_prefix="/auth")
+    app.register_blueprint(profile_bp, url_prefix="/profile")
+    app.register_blueprint(medication_bp, url_prefix="/medication")
+
+    @app.before_serving
+    async def connect_mongo():
+        amongo.connect(app.config["MONGO_URI"])
+
+    @app.after_serving
+    async def close_mongo():
+        amongo.close()
+        shutdown_executor()
+
+    # The WSGI app handles the remaining routes and does the usual startup
+    # (keys, indexes, scheduler) for this process
+    from app import create_app
+    return FallbackDispatcher(app, WsgiToAsgi(create_app(config)))
@@ -0,0 +1,68 @@
+from quart import Blueprint, current_app, request, jsonify
+from app.asgi.database import amongo
+from app.asgi.util import jwt_required
+from app.schemas.user_schema import UserSchema
+from app.utils.jwt_util import generate_jwt
+from app.utils.passwords import (
+    PasswordHasherBusy, PASSWORD_RETRY_AFTER_SECONDS, hash_password_async, verify_password_async,
+)
+
+auth_bp = Blueprint('auth', __name__)
+
+
+@auth_bp.errorhandler(PasswordHasherBusy)
+async def password_hasher_busy(e):
+    response = jsonify({'message': 'Server busy, please retry'})
+    response.headers['Retry-After'] = str(PASSWORD_RETRY_AFTER_SECONDS)
+    return response, 503
+
+
+@auth_bp.route('/register', methods=['POST'])
+async def register():
+    data = await request.get_json()
+
+    try:
+        validated_data = UserSchema(**data)
+    except Exception as e:
+        return jsonify({'error': 'Invalid input', 'details': str(e)}), 400
+
+    if await amongo.db.users.find_one({"email": validated_data.email}):  # Search by plaintext email
+        return jsonify({'message': 'User already exists'}), 400
+
+    # Hashing is deliberately slow, it runs in the hashing pool off the event loop
+    user_data = validated_data.dict()
+    user_data["password"] = await hash_password_async(validated_data.password)
+
+    await amongo.db.users.insert_one(user_data)
+
+    return jsonify({'message': 'User registered successfully'}), 201
+
+
+@auth_bp.route('/login', methods=['POST'])
+async def login():
+    data = await request.get_json()
+
+    user = await amongo.db.users.find_one({"email": data["email"]})  # Search by plaintext email
+
+    matches, new_hash = await verify_password_async(user['password'], data['password']) if user else (False, None)
+    if matches:
+        if new_hash:
+            # Upgrade a hash made with old parameters, unless the password changed meanwhile
+            await amongo.db.users.update_one(
+                {"_id": user["_id"], "password": user["password"]}, {"$set": {"password": new_hash}}
+            )
+
+        access_token = generate_jwt(str(user['_id']), user['role'], current_app.config["SECRET_KEY"])
+
+        return jsonify({
+            "access_token": access_token,
+            "name": user["name"],
+        })
+
+    return jsonify({'message': 'Invalid credentials'}), 401
+
+
+@auth_bp.route('/logout', methods=['POST'])
+@jwt_required
+async def logout():
+    return jsonify({"message": "Logout successful"}), 200
@@ -0,0 +1,22 @@
+from motor.motor_asyncio import AsyncIOMotorClient
+
+
+class AsyncMongo:
+    """Async counterpart of flask_pymongo's `mongo` for the ASGI app: `amongo.db.<collection>`."""
+
+    def __init__(self):
+        self.cx = None
+        self.db = None
+
+    def connect(self, uri):
+        # Created inside the serving event loop (before_serving)
+        self.cx = AsyncIOMotorClient(uri)
+        self.db = self.cx.get_default_database()
+
+    def close(self):
+        if self.cx is not None:
+            self.cx.close()
+            self.cx = self.db = None
+
+
+amongo = AsyncMongo()
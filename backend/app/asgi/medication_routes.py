@@ -0,0 +1,142 @@
+from bson import ObjectId
+from quart import Blueprint, Response, current_app, request, jsonify
+from app.asgi.database import amongo
+from app.asgi.util import jwt_required, run_blocking
+from app.routes.medication_routes import (
+    STREAM_CHUNK_SIZE, decrypt_medications, doses_response, missed_response, page_response,
+    parse_dose_range, parse_page_params, parse_statuses, summary_response, upcoming_response,
+)
+from app.utils.doses import delete_upcoming_doses
+from app.utils.encryption import decrypt_documents
+from app.utils.medication_summary import MEDICATION_STATUSES, assemble_summary, summary_pipeline
+
+# Read paths of /medication. Writes (add, add/bulk, update_status) are served
+# by the WSGI app behind the dispatcher in app.asgi
+medication_bp = Blueprint('medication', __name__)
+
+
+async def medication_summary(user_id, statuses=None, fields=("name", "time")):
+    """Async medication_summary: the same aggregation, decrypted in the executor."""
+    statuses = list(statuses or MEDICATION_STATUSES)
+    groups = await amongo.db.medications.aggregate(summary_pipeline(user_id, statuses, fields)).to_list(None)
+    return await run_blocking(assemble_summary, groups, statuses, fields)
+
+
+async def _stream_medications(cursor, fields, dumps):
+    """Yields decrypted medications as NDJSON lines as they come off the cursor."""
+    chunk = []
+    async for med in cursor:
+        chunk.append(med)
+        if len(chunk) == STREAM_CHUNK_SIZE:
+            for decrypted in await run_blocking(decrypt_medications, chunk, fields):
+                yield (dumps(decrypted) + "\n").encode()
+            chunk = []
+    for decrypted in await run_blocking(decrypt_medications, chunk, fields):
+        yield (dumps(decrypted) + "\n").encode()
+
+
+@medication_bp.route('/get', methods=['GET'])
+@jwt_required
+async def get_medications():
+    """Fetches the medications of the authenticated user (same params as the WSGI route)."""
+    try:
+        user_id = request.user_id  # Extracted from JWT
+
+        if not user_id:
+            return jsonify({"message": "Unauthorized"}), 401
+
+        query, projection, fields, limit = parse_page_params(request.args, user_id)
+        cursor = amongo.db.medications.find(query, projection).sort("_id", 1)
+
+        if request.args.get("stream") == "true":
+            if limit:
+                cursor = cursor.limit(limit)
+            return Response(_stream_medications(cursor, fields, current_app.json.dumps), mimetype="application/x-ndjson")
+
+        # One extra document tells us whether there is another page
+        if limit:
+            cursor = cursor.limit(limit + 1)
+
+        encrypted_medications = await cursor.to_list(None)
+        return jsonify(await run_blocking(page_response, encrypted_medications, fields, limit)), 200
+
+    except Exception as e:
+        print(e)
+        return jsonify({"error": str(e)}), 400
+
+
+@medication_bp.route('/summary', methods=['GET'])
+@jwt_required
+async def get_medication_summary():
+    """Returns counts and grouped medication lists by status from one aggregation."""
+    try:
+        statuses = parse_statuses(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    summary = await medication_summary(request.user_id, statuses)
+    return jsonify(summary_response(summary)), 200
+
+
+@medication_bp.route('/missed', methods=['GET'])
+@jwt_required
+async def send_missed_medication_notifications():
+    """Returns the names of all missed medications for the user."""
+    missed = (await medication_summary(request.user_id, ["missed"], fields=["name"]))["missed"]["medications"]
+    return jsonify(missed_response(missed)), 200
+
+
+@medication_bp.route('/clear', methods=['DELETE'])
+@jwt_required
+async def delete_medications():
+    """Clears the user's missed medications and their upcoming doses."""
+    user_id = request.user_id
+
+    missed = (await medication_summary(user_id, ["missed"], fields=["name"]))["missed"]["medications"]
+
+    if not any(med["name"] for med in missed):
+        return jsonify({"message": "No missed medications found for the user."}), 200
+
+    # Clear exactly the missed medications that were fetched
+    missed_med_ids = [med["_id"] for med in missed]
+    await amongo.db.medications.delete_many({"_id": {"$in": [ObjectId(med_id) for med_id in missed_med_ids]}, "user_id": user_id})
+
+    # Drop their future doses; taken/missed dose history is kept
+    # Also updates the adherence rollups
+    await run_blocking(delete_upcoming_doses, missed_med_ids)
+
+    return jsonify({
+        "message": "Missed medications cleared.",
+    }), 200
+
+
+@medication_bp.route('/upcoming', methods=['GET'])
+@jwt_required
+async def upcoming():
+    """Returns the names and times of the user's upcoming medications."""
+    upcoming_meds = (await medication_summary(request.user_id, ["upcoming"], fields=["name", "time"]))["upcoming"]["medications"]
+    return jsonify(upcoming_response(upcoming_meds)), 200
+
+
+@medication_bp.route('/doses', methods=['GET'])
+@jwt_required
+async def get_dose_schedule():
+    """Returns the authenticated user's dose instances between `start` and `end`."""
+    user_id = request.user_id
+
+    try:
+        start, end = parse_dose_range(request.args)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid date: {e}"}), 400
+
+    doses = await amongo.db.doses.find(
+        {"user_id": user_id, "due_at": {"$gte": start, "$lt": end}},
+    ).sort("due_at", 1).to_list(None)
+
+    # Decrypt each medication name once, in a single batch
+    medication_ids = list({ObjectId(dose["medication_id"]) for dose in doses})
+    medications = await amongo.db.medications.find({"_id": {"$in": medication_ids}, "user_id": user_id}).to_list(None)
+    decrypted = await run_blocking(decrypt_documents, medications, fields=["name"])
+    names = {str(med["_id"]): med["name"] for med in decrypted}
+
+    return jsonify(doses_response(doses, names)), 200
@@ -0,0 +1,115 @@
+from bson.objectid import ObjectId
+from quart import Blueprint, request, jsonify
+from app.asgi.database import amongo
+from app.asgi.util import get_user, invalidate_user, jwt_required, run_blocking
+from app.schemas.patient_schema import PatientProfileSchema
+from app.schemas.caregiver_schema import CaregiverProfileSchema
+from app.utils.notification import invalidate_caregiver_cache
+from app.utils.encryption import decrypt_profile_data, encrypt_document
+from app.routes.profile_routes import pop_patient_emails
+
+profile_bp = Blueprint('profile', __name__)
+
+
+@profile_bp.route('/register', methods=['POST'])
+@jwt_required
+async def register_profile():
+    """Registers a user's profile after authentication, validating based on role"""
+    data = await request.get_json()
+    user_id = request.user_id  # Extracted from JWT
+
+    if not user_id:
+        return jsonify({"message": "Unauthorized"}), 401
+
+    # Fetch user (cached)
+    user = await get_user(user_id)
+    if not user:
+        return jsonify({"message": "User not found"}), 404
+
+    # Ensure role is currently "general" before updating
+    if user['role'] != "general":
+        return jsonify({"message": "Profile already registered"}), 403
+
+    try:
+        # Validate profile based on role
+        if data["role"] == "patient":
+            validated_data = PatientProfileSchema(**data["profile"])
+            profile_data = await run_blocking(encrypt_document, validated_data.dict())  # Encrypt for patients
+        elif data["role"] == "caregiver":
+            # Remove unwanted fields before validation
+            patient_emails = pop_patient_emails(data["profile"])
+            data["profile"].pop("name", None)
+
+            if not patient_emails:
+                return jsonify({"message": "Patient email is required"}), 400
+
+            validated_data = CaregiverProfileSchema(**data["profile"])
+            profile_data = validated_data.dict()  # No encryption for caregivers
+
+            # Find every patient by email in one query
+            patients = await amongo.db.users.find({"email": {"$in": patient_emails}, "role": "patient"}, {"email": 1}).to_list(None)
+            found = {patient["email"] for patient in patients}
+            missing = [email for email in patient_emails if email not in found]
+            if missing:
+                return jsonify({"message": "Patient with this email not found", "emails": missing}), 404
+
+            profile_data["patients_assigned"] = [str(patient["_id"]) for patient in patients]
+
+        else:
+            return jsonify({"message": "Invalid role"}), 400
+
+        # The role condition guards against a cached "general" role that is already stale
+        result = await amongo.db.users.update_one(
+            {"_id": ObjectId(user_id), "role": "general"},
+            {"$set": {
+                "role": data["role"],  # Store role without encryption
+                "profile": profile_data  # Store profile based on role
+            }}
+        )
+
+        # Role and profile changed; drop the cached user the WSGI routes share
+        invalidate_user(user_id)
+        if not result.matched_count:
+            return jsonify({"message": "Profile already registered"}), 403
+
+        # Notification fan-out must see the new caregiver straight away
+        if data["role"] == "caregiver":
+            invalidate_caregiver_cache(profile_data["patients_assigned"])
+
+        return jsonify({"message": "Profile registered successfully"}), 200
+
+    except Exception as e:
+        print(e)
+        return jsonify({"error": str(e)}), 400
+
+
+@profile_bp.route('/get-profile', methods=['GET'])
+@jwt_required
+async def get_profile():
+    """Retrieves a user's profile after authentication, decrypting only if the role is 'patient'."""
+    user_id = request.user_id  # Extracted from JWT
+
+    if not user_id:
+        return jsonify({"message": "Unauthorized"}), 401
+
+    try:
+        user = await get_user(user_id)  # Cached
+        if not user:
+            return jsonify({"message": "User not found"}), 404
+
+        role = user.get("role", "")
+        if role == "general":
+            return jsonify({"message": "Profile not registered"}), 403
+
+        # Decrypt profile data only for patients
+        if role == "patient":
+            user = await run_blocking(decrypt_profile_data, user)
+
+        return jsonify({
+            "role": role,
+            "user": user
+        }), 200
+
+    except Exception as e:
+        print(e)
+        return jsonify({"error": str(e)}), 500
@@ -0,0 +1,91 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, wraps
+import jwt
+from bson import ObjectId
+from bson.errors import InvalidId
+from quart import current_app, g, jsonify, request
+from app.asgi.database import amongo
+from app.utils.jwt_util import decode_jwt
+from app.utils.user_cache import user_cache, USER_CACHE_PROJECTION
+
+# Decryption runs here so the event loop keeps serving other requests
+# (password hashing has its own process pool, see app.utils.passwords)
+ASGI_EXECUTOR_WORKERS = int(os.getenv("ASGI_EXECUTOR_WORKERS", 8))
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=ASGI_EXECUTOR_WORKERS, thread_name_prefix="asgi-crypto")
+    return _executor
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Runs CPU-bound `func` (decryption, hashing, ...) off the event loop."""
+    return await asyncio.get_running_loop().run_in_executor(_get_executor(), partial(func, *args, **kwargs))
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
+
+
+async def get_user(user_id):
+    """
+    Async app.utils.user_cache.get_user: once per request, then from the same
+    process-wide cache the WSGI routes use. Callers must not modify the result.
+    """
+    user_id = str(user_id)
+    request_users = g.setdefault("users", {})
+    if user_id in request_users:
+        return request_users[user_id]
+
+    user = user_cache.get(user_id)
+    if user is None:
+        try:
+            user = await amongo.db.users.find_one({"_id": ObjectId(user_id)}, USER_CACHE_PROJECTION) or {}
+        except InvalidId:
+            user = {}
+        user_cache.set(user_id, user)  # Empty dict caches "no such user"
+
+    request_users[user_id] = user or None
+    return user or None
+
+
+def invalidate_user(user_id):
+    """
+    app.utils.user_cache.invalidate_user for the ASGI app: that one only
+    clears Flask's g, this one the current Quart request's cache.
+    """
+    user_id = str(user_id)
+    user_cache.invalidate(user_id)
+    g.get("users", {}).pop(user_id, None)
+
+
+def jwt_required(f):
+    """Async version of app.utils.jwt_util.jwt_required with the same responses."""
+    @wraps(f)
+    async def decorated_function(*args, **kwargs):
+        token = request.headers.get("Authorization")
+
+        if not token:
+            return jsonify({"error": "Token is missing"}), 401
+
+        try:
+            decoded_token = decode_jwt(token, current_app.config["SECRET_KEY"])
+            request.user_id = decoded_token["user_id"]
+            request.role = decoded_token["role"]
+        except jwt.ExpiredSignatureError:
+            return jsonify({"error": "Token expired"}), 401
+        except jwt.InvalidTokenError:
+            return jsonify({"error": "Invalid token"}), 401
+
+        return await f(*args, **kwargs)
+
+    return decorated_function
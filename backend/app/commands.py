@@ -0,0 +1,100 @@
+import click
+
+
+def register_commands(app):
+    """Registers maintenance commands on the Flask CLI (run with `flask <command>`)."""
+
+    @app.cli.command("backfill-blind-indexes")
+    @click.option("--batch-size", default=500, show_default=True, help="Medications rewritten per bulk write")
+    def backfill_blind_indexes(batch_size):
+        """Adds blind index fields to medications stored before they existed."""
+        from app.utils.blind_index import backfill_medication_blind_indexes
+
+        updated = backfill_medication_blind_indexes(batch_size=batch_size)
+        click.echo(f"Backfilled blind indexes on {updated} medications.")
+
+    @app.cli.command("migrate-ciphertext-binary")
+    @click.option("--batch-size", default=500, show_default=True, help="Documents rewritten per bulk write")
+    @click.option("--restart", is_flag=True, help="Ignore the saved checkpoint and start from the beginning")
+    def migrate_ciphertext_binary(batch_size, restart):
+        """Rewrites base64 ciphertexts in profiles and medications as raw BSON Binary."""
+        from app.utils.migrations import migrate_ciphertext_to_binary
+
+        rewritten = migrate_ciphertext_to_binary(batch_size=batch_size, restart=restart)
+        click.echo(f"Rewrote {rewritten['users']} profiles and {rewritten['medications']} medications.")
+
+    @app.cli.command("migrate-patients-assigned")
+    @click.option("--batch-size", default=500, show_default=True, help="Caregivers rewritten per bulk write")
+    @click.option("--restart", is_flag=True, help="Ignore the saved checkpoint and start from the beginning")
+    def migrate_patients_assigned(batch_size, restart):
+        """Turns caregivers' single assigned patient ID into a list."""
+        from app.utils.migrations import migrate_patients_assigned_to_list
+
+        rewritten = migrate_patients_assigned_to_list(batch_size=batch_size, restart=restart)
+        click.echo(f"Rewrote {rewritten} caregiver profiles.")
+
+    @app.cli.command("rebuild-adherence")
+    @click.option("--user-id", default=None, help="Only this patient")
+    @click.option("--force", is_flag=True, help="Run even though a scheduler holds the sweep lease")
+    def rebuild_adherence_command(user_id, force):
+        """
+        Recomputes the adherence rollups from the dose history, first giving
+        older doses their medication's timezone. Run once after deploying the
+        rollups, before the scheduler starts, and whenever they drift.
+        """
+        from app.utils.adherence import rebuild_adherence
+        from app.utils.lease import lease_owner
+        from app.utils.migrations import migrate_dose_timezones
+        from app.utils.status_updater import SWEEP_LEASE
+
+        # Live dose updates would race the recount and be lost
+        owner = lease_owner(SWEEP_LEASE)
+        if owner and not force:
+            click.echo(f"The scheduler is running ({owner} holds '{SWEEP_LEASE}'); stop it first or pass --force.", err=True)
+            raise SystemExit(1)
+
+        if not user_id:
+            click.echo(f"Set the timezone on {migrate_dose_timezones(restart=True)} older doses.")
+        written = rebuild_adherence(user_id)
+        click.echo(f"Wrote {written} adherence rollups.")
+
+    @app.cli.command("ensure-indexes")
+    @click.option("--collection", "collections", multiple=True, help="Only this collection (repeatable)")
+    def ensure_indexes_command(collections):
+        """Creates the declared MongoDB indexes (idempotent)."""
+        from app.utils.indexes import ensure_indexes
+
+        created, failed = ensure_indexes(list(collections) or None)
+        for collection, names in created.items():
+            click.echo(f"{collection}: {', '.join(names)}")
+        for collection, name in failed:
+            click.echo(f"FAILED: {name} on {collection}", err=True)
+        if failed:
+            raise SystemExit(1)
+
+    @app.cli.command("check-indexes")
+    def check_indexes():
+        """Explains every known query shape and fails if any of them does a collection scan."""
+        from app.utils.indexes import find_collection_scans, query_shapes
+
+        scans = find_collection_scans()
+        for name, collection in scans:
+            click.echo(f"COLLSCAN: {name} on {collection}", err=True)
+        if scans:
+            raise SystemExit(1)
+        click.echo(f"All {len(query_shapes())} query shapes use an index.")
+
+    @app.cli.command("show-locks")
+    def show_locks():
+        """Shows which process holds each scheduled-job lease."""
+        from datetime import datetime, timezone
+        from app.utils.lease import get_lease_states
+
+        now = datetime.now(timezone.utc).replace(tzinfo=None)  # PyMongo returns naive UTC
+        for lease in get_lease_states():
+            expires_at = lease.get("expires_at")
+            state = "held" if lease.get("owner") and expires_at and expires_at > now else "free"
+            click.echo(
+                f"{lease['_id']}: {state}, owner={lease.get('owner')} token={lease.get('token')} "
+                f"acquired={lease.get('acquired_at')} expires={expires_at}"
+            )
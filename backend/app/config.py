@@ -7,3 +7,25 @@ class Config:
     SECRET_KEY = os.getenv("SECRET_KEY")
     MONGO_URI = os.getenv("MONGO_URI")
     JWT_EXPIRATION = int(os.getenv("JWT_EXPIRATION", 86400))  # Default 1 day
+
+    # Startup behaviour: what create_app initializes eagerly. Anything not
+    # initialized here is set up lazily on first use.
+    LOAD_KEYS_ON_STARTUP = os.getenv("LOAD_KEYS_ON_STARTUP", "true").lower() == "true"  # Fail fast on missing keys
+    INIT_FIREBASE_ON_STARTUP = os.getenv("INIT_FIREBASE_ON_STARTUP", "false").lower() == "true"
+    # Background jobs: every serving worker runs the scheduler, and the leases in
+    # app.utils.lease let one of them do each job at a time, with another taking
+    # over if it dies. `flask <command>` calls and the dev reloader's parent never start it.
+    START_SCHEDULER = os.getenv("START_SCHEDULER", "true").lower() == "true"
+    CREATE_INDEXES_ON_STARTUP = os.getenv("CREATE_INDEXES_ON_STARTUP", "true").lower() == "true"
+
+    # Observability: opt-in Prometheus-text /metrics endpoint (scrapers send
+    # "Authorization: Bearer <METRICS_TOKEN>" when a token is set) and the opt-in
+    # slow-request log (requests slower than this many ms are printed with their breakdown; 0 = off)
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "false").lower() == "true"
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+    SLOW_REQUEST_MS = int(os.getenv("SLOW_REQUEST_MS", 0))
+
+    # Opt-in: notification history older than this many days is removed by a TTL
+    # index (see app.utils.indexes); 0 keeps it forever. Turning it off again
+    # later needs the TTL index dropped by hand.
+    NOTIFICATION_RETENTION_DAYS = int(os.getenv("NOTIFICATION_RETENTION_DAYS", 0))
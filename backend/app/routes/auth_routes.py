@@ -1,13 +1,24 @@
 from flask import Blueprint, request, jsonify
-from werkzeug.security import generate_password_hash, check_password_hash
 from app.database import mongo
 from app.schemas.user_schema import UserSchema
 from app.utils.jwt_util import generate_jwt, jwt_required
+from app.utils.passwords import (
+    PasswordHasherBusy, PASSWORD_RETRY_AFTER_SECONDS, hash_password, verify_password,
+)
 from bson.objectid import ObjectId
 from app.utils.encryption import encrypt_profile_data, decrypt_data, encrypt_data
 
 auth_bp = Blueprint('auth', __name__)
 
+
+@auth_bp.errorhandler(PasswordHasherBusy)
+def password_hasher_busy(e):
+    """Fail fast while the hashing pool is saturated instead of queueing the request."""
+    response = jsonify({'message': 'Server busy, please retry'})
+    response.headers['Retry-After'] = str(PASSWORD_RETRY_AFTER_SECONDS)
+    return response, 503
+
+
 @auth_bp.route('/register', methods=['POST'])
 def register():
     data = request.json
@@ -20,8 +31,8 @@ def register():
     if mongo.db.users.find_one({"email": validated_data.email}):  # Search by plaintext email
         return jsonify({'message': 'User already exists'}), 400
 
-    # Hash the password (DO NOT ENCRYPT anything else)
-    hashed_password = generate_password_hash(validated_data.password)
+    # Hash the password in the hashing pool (DO NOT ENCRYPT anything else)
+    hashed_password = hash_password(validated_data.password)
 
     # Prepare user data
     user_data = validated_data.dict()
@@ -40,7 +51,15 @@ def login():
 
     user = mongo.db.users.find_one({"email": data["email"]})  # Search by plaintext email
 
-    if user and check_password_hash(user['password'], data['password']):
+    matches, new_hash = verify_password(user['password'], data['password']) if user else (False, None)
+    if matches:
+        if new_hash:
+            # Hash parameters changed since this hash was stored: upgrade it,
+            # unless the password was changed concurrently
+            mongo.db.users.update_one(
+                {"_id": user["_id"], "password": user["password"]}, {"$set": {"password": new_hash}}
+            )
+
         access_token = generate_jwt(str(user['_id']), user['role'])  # No decryption needed
   
         return jsonify({
@@ -0,0 +1,22 @@
+from flask import Blueprint, request, jsonify
+from app.utils.jwt_util import jwt_required
+from app.utils.caregivers import caregiver_dashboard
+
+caregiver_bp = Blueprint('caregiver', __name__)
+
+
+@caregiver_bp.route('/dashboard', methods=['GET'])
+@jwt_required
+def get_dashboard():
+    """
+    Returns the current medication status of every patient assigned to the
+    authenticated caregiver, built from a single aggregation.
+    """
+    if request.role != "caregiver":
+        return jsonify({"message": "Only caregivers have a dashboard"}), 403
+
+    dashboard = caregiver_dashboard(request.user_id)
+    if dashboard is None:
+        return jsonify({"message": "User not found"}), 404
+
+    return jsonify({"patients": dashboard}), 200
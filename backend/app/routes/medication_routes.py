@@ -1,14 +1,102 @@
-from flask import Blueprint, request, jsonify
+import json
+import os
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
 from flask_jwt_extended import jwt_required
 from bson import ObjectId
+from datetime import date, datetime, timedelta, timezone
 from pymongo import errors
+from pymongo.errors import BulkWriteError
 from app.database import mongo
 from app.schemas.medication_schema import MedicationSchema
-from app.utils.encryption import encrypt_profile_data, encrypt_data, decrypt_profile_data, decrypt_data
+from app.utils.encryption import encrypt_document, encrypt_documents, upgrade_document_update, decrypt_documents, decrypt_document_fields, PLAINTEXT_FIELDS, SEALED_FIELD, BLIND_INDEX_ENABLED
 from app.utils.jwt_util import jwt_required
+from app.utils.user_cache import get_user
+from app.utils.blind_index import medication_blind_indexes, name_index_query
+from app.utils.schedule import compute_next_due_at, roll_forward, _as_utc
+from app.utils.doses import materialize_doses, materialize_doses_many, mark_dose_taken, get_doses, delete_upcoming_doses, DOSE_HORIZON_DAYS, DOSE_TAKE_WINDOW_MINUTES
+from app.utils.adherence import get_adherence, summarize_adherence
+from app.utils.due_timer import schedule_medication_due
+from app.utils.medication_summary import medication_summary, MEDICATION_STATUSES
 
 medication_bp = Blueprint('medication', __name__)
 
+# Bulk import limits
+BULK_ADD_MAX_ITEMS = int(os.getenv("BULK_ADD_MAX_ITEMS", 1000))  # Per JSON request; use NDJSON for more
+BULK_INSERT_BATCH_SIZE = int(os.getenv("BULK_INSERT_BATCH_SIZE", 500))  # Medications per insert_many
+
+
+def _validate_medication(data, user_id, user):
+    """
+    Validates one medication payload for `user_id` and splits it into the
+    plaintext fields stored next to the ciphertext and the data to encrypt.
+    Raises ValidationError / ValueError for invalid items.
+    """
+    data = dict(data)
+    data["user_id"] = str(user_id)  # Ensure user_id is set
+    validated_medication = MedicationSchema(**data)
+    tz_name = validated_medication.timezone or user.get("timezone")
+
+    # Encrypt only the medication data (excluding user_id)
+    medication_data = validated_medication.dict(exclude={"user_id", "status", "timezone"})  # Exclude user_id from encryption
+
+    plaintext = {
+        "user_id": str(validated_medication.user_id),  # Ensure `user_id` remains in plaintext
+        "status": str(validated_medication.status),
+        # Plaintext UTC due time so the missed-dose sweep is an indexed range query
+        "timezone": tz_name,
+        "next_due_at": compute_next_due_at(medication_data["time"], medication_data["frequency"], tz_name),
+    }
+    # Keyed hashes of name / time-of-day so they can be queried without decrypting
+    plaintext.update(medication_blind_indexes(medication_data))
+    return plaintext, medication_data
+
+
+def _insert_medications(items, user_id, user):
+    """
+    Validates, encrypts and inserts a batch of (index, payload) medications with
+    one unordered insert_many. Returns (inserted_count, row_errors) where each error
+    is {"index": <position in the upload>, "error": <message>}.
+    """
+    row_errors = []
+    valid = []
+    for index, data in items:
+        try:
+            if not isinstance(data, dict):
+                raise ValueError("Medication must be a JSON object")
+            valid.append((index, *_validate_medication(data, user_id, user)))
+        except Exception as e:
+            row_errors.append({"index": index, "error": str(e)})
+
+    if not valid:
+        return 0, row_errors
+
+    # Encrypt the whole batch in one pass
+    encrypted = encrypt_documents([medication_data for _, _, medication_data in valid])
+    documents = [{**sealed, **plaintext} for (_, plaintext, _), sealed in zip(valid, encrypted)]
+
+    failed = set()
+    try:
+        mongo.db.medications.insert_many(documents, ordered=False)
+    except BulkWriteError as e:
+        for write_error in e.details.get("writeErrors", []):
+            failed.add(write_error["index"])
+            row_errors.append({"index": valid[write_error["index"]][0], "error": write_error.get("errmsg")})
+
+    inserted = [(document, medication_data) for position, (document, (_, _, medication_data))
+                in enumerate(zip(documents, valid)) if position not in failed]
+
+    # Generate the dose instances for the upcoming horizon in one write
+    materialize_doses_many([
+        (document, medication_data["time"], medication_data["frequency"]) for document, medication_data in inserted
+    ])
+
+    # Event mode: fire the missed transition exactly at the due time
+    for document, _ in inserted:
+        schedule_medication_due(document["_id"], document["next_due_at"], document["status"])
+
+    return len(inserted), row_errors
+
+
 @medication_bp.route('/add', methods=['POST'])
 @jwt_required
 def add_medication():
@@ -22,71 +110,210 @@ def add_medication():
         return jsonify({"message": "Unauthorized"}), 401
 
     # Validate user existence
-    user = mongo.db.users.find_one({"_id": ObjectId(user_id)})
+    user = get_user(user_id)
     if not user:
         return jsonify({"message": "User not found"}), 404
 
     try:
         # Validate medication data
-        data["user_id"] = str(user_id)  # Ensure user_id is set
-        validated_medication = MedicationSchema(**data)
-        print(data)
-        # Encrypt medication details
-        # Extract user_id separately
-        user_id = validated_medication.user_id
-        status = validated_medication.status
-
-        # Encrypt only the medication data (excluding user_id)
-        medication_data = validated_medication.dict(exclude={"user_id", "status"})  # Exclude user_id from encryption
-        encrypted_medication = encrypt_profile_data(medication_data)
-
-        # Add `user_id` back to the encrypted structure
-        encrypted_medication["user_id"] = str(user_id)  # Ensure `user_id` remains in plaintext
-        encrypted_medication["status"] = str(status)  # Ensure `user_id` remains in plaintext
+        plaintext, medication_data = _validate_medication(data, user_id, user)
+
+        # Encrypt medication details and add the plaintext fields back
+        encrypted_medication = encrypt_document(medication_data)
+        encrypted_medication.update(plaintext)
 
         # Insert into MongoDB
         mongo.db.medications.insert_one(encrypted_medication)
 
+        # Generate the dose instances for the upcoming horizon
+        materialize_doses(encrypted_medication, medication_data["time"], medication_data["frequency"])
+
+        # Event mode: fire the missed transition exactly at the due time
+        schedule_medication_due(encrypted_medication["_id"], encrypted_medication["next_due_at"], plaintext["status"])
 
         return jsonify({"message": "Medication added successfully"}), 201
 
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
+
+def _read_ndjson_batches(stream, row_errors):
+    """
+    Yields batches of up to BULK_INSERT_BATCH_SIZE (line index, payload) pairs
+    from an NDJSON upload without reading it all into memory. Lines that are
+    not valid JSON are recorded in `row_errors` and skipped; blank lines are ignored.
+    """
+    batch = []
+    for index, line in enumerate(stream):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            batch.append((index, json.loads(line)))
+        except ValueError as e:
+            row_errors.append({"index": index, "error": f"Invalid JSON: {e}"})
+            continue
+        if len(batch) == BULK_INSERT_BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+@medication_bp.route('/add/bulk', methods=['POST'])
+@jwt_required
+def add_medications_bulk():
+    """
+    Adds many medications for the authenticated user in one request.
+    Accepts a JSON list (or {"medications": [...]}) of up to BULK_ADD_MAX_ITEMS
+    items, or an `application/x-ndjson` upload (one medication per line) of any
+    size, inserted in batches. Valid items are inserted even if others fail;
+    per-item errors are reported by their index in the upload.
+    """
+    user_id = request.user_id  # Extracted from JWT
+
+    if not user_id:
+        return jsonify({"message": "Unauthorized"}), 401
+
+    # Validate user existence once for the whole upload
+    user = get_user(user_id)
+    if not user:
+        return jsonify({"message": "User not found"}), 404
+
+    inserted = 0
+    row_errors = []
+
+    if request.mimetype == "application/x-ndjson":
+        for batch in _read_ndjson_batches(request.stream, row_errors):
+            batch_inserted, batch_errors = _insert_medications(batch, user_id, user)
+            inserted += batch_inserted
+            row_errors.extend(batch_errors)
+    else:
+        data = request.get_json(silent=True)
+        items = data.get("medications") if isinstance(data, dict) else data
+        if not isinstance(items, list):
+            return jsonify({"error": "Expected a list of medications"}), 400
+        if len(items) > BULK_ADD_MAX_ITEMS:
+            return jsonify({"error": f"At most {BULK_ADD_MAX_ITEMS} medications per request; use NDJSON for larger imports"}), 413
+
+        for offset in range(0, len(items), BULK_INSERT_BATCH_SIZE):
+            batch = list(enumerate(items[offset:offset + BULK_INSERT_BATCH_SIZE], start=offset))
+            batch_inserted, batch_errors = _insert_medications(batch, user_id, user)
+            inserted += batch_inserted
+            row_errors.extend(batch_errors)
+
+    row_errors.sort(key=lambda error: error["index"])
+    return jsonify({
+        "message": f"{inserted} medications added",
+        "inserted": inserted,
+        "failed": len(row_errors),
+        "errors": row_errors,
+    }), 201 if inserted else 400
+
+STREAM_CHUNK_SIZE = 32  # Medications decrypted per chunk in streaming mode
+
+
+def decrypt_medications(medications, fields=None):
+    """
+    Decrypts medications for the API: _id as a string and, when `fields` is
+    given, only those fields (plus _id) in the result.
+    """
+    if fields is None:
+        decrypted = decrypt_documents(medications)
+    else:
+        encrypted_fields = [field for field in fields if field not in PLAINTEXT_FIELDS]
+        decrypted = decrypt_documents(medications, fields=encrypted_fields)
+        decrypted = [{k: v for k, v in med.items() if k in fields or k == "_id"} for med in decrypted]
+
+    for med in decrypted:
+        med["_id"] = str(med["_id"])  # Convert ObjectId to string
+    return decrypted
+
+
+def _stream_medications(cursor, fields):
+    """Yields decrypted medications as NDJSON lines as they come off the cursor."""
+    chunk = []
+    for med in cursor:
+        chunk.append(med)
+        if len(chunk) == STREAM_CHUNK_SIZE:
+            for decrypted in decrypt_medications(chunk, fields):
+                yield current_app.json.dumps(decrypted) + "\n"
+            chunk = []
+    for decrypted in decrypt_medications(chunk, fields):
+        yield current_app.json.dumps(decrypted) + "\n"
+
+
+def parse_page_params(args, user_id):
+    """Builds (query, projection, fields, limit) for /get from its query params."""
+    query = {"user_id": user_id}
+    if args.get("cursor"):
+        query["_id"] = {"$gt": ObjectId(args["cursor"])}
+
+    # Push the projection down to MongoDB; sealed documents keep their single blob
+    fields = None
+    projection = None
+    if args.get("fields"):
+        fields = [field.strip() for field in args["fields"].split(",") if field.strip()]
+        projection = {field: 1 for field in fields}
+        projection[SEALED_FIELD] = 1
+
+    limit = int(args["limit"]) if args.get("limit") else None
+    if limit is not None and limit < 1:
+        raise ValueError("limit must be at least 1")
+    return query, projection, fields, limit
+
+
+def page_response(encrypted_medications, fields, limit):
+    """Decrypts one page (fetched with limit + 1) and adds `next_cursor` when paginating."""
+    next_cursor = None
+    if limit and len(encrypted_medications) > limit:
+        encrypted_medications = encrypted_medications[:limit]
+        next_cursor = str(encrypted_medications[-1]["_id"])
+
+    # Decrypt all medications at once (user_id, _id and status stay as they are)
+    processed_medications = decrypt_medications(encrypted_medications, fields)
+
+    response = {"medications": processed_medications}
+    if limit:
+        response["next_cursor"] = next_cursor
+    return response
+
+
 @medication_bp.route('/get', methods=['GET'])
 @jwt_required
 def get_medications():
-    """Fetches all medications for the authenticated user."""
+    """
+    Fetches the medications of the authenticated user.
+    Optional query params:
+      - limit / cursor: page through medications (`next_cursor` is returned)
+      - fields: comma-separated fields to return; only these are fetched and decrypted
+      - stream=true: stream NDJSON, one decrypted medication per line
+    """
     try:
         user_id = request.user_id  # Extracted from JWT
 
         if not user_id:
             return jsonify({"message": "Unauthorized"}), 401
 
+        query, projection, fields, limit = parse_page_params(request.args, user_id)
+
         # Fetch encrypted medications from the database
-        encrypted_medications_cursor = mongo.db.medications.find({"user_id": user_id})
+        encrypted_medications_cursor = mongo.db.medications.find(query, projection).sort("_id", 1)
 
-        # Convert cursor to list of dictionaries
-        encrypted_medications = list(encrypted_medications_cursor)  
+        if request.args.get("stream") == "true":
+            if limit:
+                encrypted_medications_cursor = encrypted_medications_cursor.limit(limit)
+            return Response(
+                stream_with_context(_stream_medications(encrypted_medications_cursor, fields)),
+                mimetype="application/x-ndjson",
+            )
 
-        for med in encrypted_medications:
-            med["_id"] = str(med["_id"])  # Convert ObjectId to string
+        # One extra document tells us whether there is another page
+        if limit:
+            encrypted_medications_cursor = encrypted_medications_cursor.limit(limit + 1)
 
-        
-        # Decrypt all medications at once
-        processed_medications = []
-        for med in encrypted_medications:
-            excluded_fields = {key: med[key] for key in ["user_id", "_id", "status"] if key in med}
-            encrypted_data = {k: v for k, v in med.items() if k not in {"user_id", "_id", "status"}}
-            
-            # Decrypt the remaining data
-            decrypted_data = decrypt_profile_data(encrypted_data)
-            
-            # Merge decrypted data with excluded fields
-            decrypted_med = {**excluded_fields, **decrypted_data}
-            processed_medications.append(decrypted_med)
-        
-        return jsonify({"medications": processed_medications}), 200
+        # Convert cursor to list of dictionaries
+        return jsonify(page_response(list(encrypted_medications_cursor), fields, limit)), 200
 
     except Exception as e:
         print(e)
@@ -108,11 +335,32 @@ def update_medication_status(medication_id):
         if not medication:
             return jsonify({"message": "Medication not found"}), 404
 
-        # Update status to "taken"
-        mongo.db.medications.update_one(
-            {"_id": ObjectId(medication_id)},
-            {"$set": {"status": "taken"}}
-        )
+        # Only a dose that is due (or within the take window) can be taken;
+        # otherwise a double tap would roll the schedule past a whole dose
+        now = datetime.now(timezone.utc)
+        due_at = medication.get("next_due_at")
+        if due_at is not None and _as_utc(due_at) > now + timedelta(minutes=DOSE_TAKE_WINDOW_MINUTES):
+            return jsonify({"message": "No dose of this medication is due yet"}), 409
+
+        # Roll the due time forward to the next dose
+        schedule = decrypt_document_fields(medication, ["time", "frequency"])
+        next_due_at = roll_forward(due_at, schedule["time"], schedule["frequency"], medication.get("timezone"), now=now)
+
+        # Update status to "taken" (the sweep and the due timer turn it "missed"
+        # if the next dose passes), upgrading legacy per-field documents on the way.
+        # Conditional on the due time read above, so concurrent takes roll forward once.
+        update = upgrade_document_update(medication) or {"$set": {}}
+        update["$set"]["status"] = "taken"
+        update["$set"]["next_due_at"] = next_due_at
+        result = mongo.db.medications.update_one({"_id": ObjectId(medication_id), "next_due_at": due_at}, update)
+        if not result.matched_count:
+            return jsonify({"message": "Medication was just updated, please retry"}), 409
+
+        # Record the individual dose as taken
+        mark_dose_taken(medication_id, user_id, now=now)
+
+        # Re-arm the pending timer entry for the next dose
+        schedule_medication_due(medication_id, next_due_at, "taken")
 
         return jsonify({"message": "Medication status updated to 'taken'"}), 200
 
@@ -121,33 +369,97 @@ def update_medication_status(medication_id):
         return jsonify({"error": str(e)}), 400
 
 
-@medication_bp.route('/missed', methods=['GET'])
+@medication_bp.route('/search', methods=['GET'])
 @jwt_required
-def send_missed_medication_notifications():
+def search_medications():
+    """Finds the user's medications by exact name (case and whitespace insensitive) via the name blind index."""
+    name = request.args.get("name", "").strip()
+    if not name:
+        return jsonify({"error": "name is required"}), 400
+    if not BLIND_INDEX_ENABLED:
+        return jsonify({"error": "Medication search is disabled"}), 404
+
+    medications = list(mongo.db.medications.find({"user_id": request.user_id, **name_index_query(name)}))
+    return jsonify({"medications": decrypt_medications(medications)}), 200
+
+
+@medication_bp.route('/summary', methods=['GET'])
+@jwt_required
+def get_medication_summary():
     """
-    Fetches all missed medications for the given user and sends notifications to caregivers.
-    Returns the names of all missed medications for the user.
+    Returns counts and grouped medication lists by status from one aggregation.
+    Optional `statuses` param (comma-separated) restricts the groups returned.
     """
-    user_id = request.user_id  # Assuming user_id is passed in the request
+    user_id = request.user_id  # Extracted from JWT
 
-    # Fetch all missed medications for the user
-    missed_medications = mongo.db.medications.find({"user_id": user_id, "status": "missed"})
+    try:
+        statuses = parse_statuses(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    missed_meds_names = []
+    summary = medication_summary(user_id, statuses)
+    return jsonify(summary_response(summary)), 200
 
-    for med in missed_medications:
-        medication_name = decrypt_data(med.get("name"))
-        if medication_name:
-            missed_meds_names.append(medication_name)
+
+def parse_statuses(args):
+    """The statuses listed in the `statuses` param, or None for all; raises ValueError for unknown ones."""
+    statuses = args.get("statuses")
+    if not statuses:
+        return None
+    statuses = statuses.split(",")
+    unknown = [status for status in statuses if status not in MEDICATION_STATUSES]
+    if unknown:
+        raise ValueError(f"Unknown statuses: {', '.join(unknown)}")
+    return statuses
+
+
+def summary_response(summary):
+    return {
+        "counts": {status: group["count"] for status, group in summary.items()},
+        "medications": {status: group["medications"] for status, group in summary.items()},
+    }
+
+
+def missed_response(missed):
+    """Response body of /missed for the summary's missed group."""
+    missed_meds_names = [med["name"] for med in missed if med["name"]]
 
     if not missed_meds_names:
-        return jsonify({"message": "No missed medications found for the user."}), 200
+        return {"message": "No missed medications found for the user."}
 
+    return {
+        "message": "Notifications sent for missed medications.",
+        "missed_medications": missed_meds_names
+    }
 
-    return jsonify({
+
+def upcoming_response(upcoming_meds):
+    """Response body of /upcoming for the summary's upcoming group."""
+    missed_meds_names = [
+        {"name": med["name"], "time": med["time"]} for med in upcoming_meds if med["name"] and med["time"]
+    ]
+
+    if not missed_meds_names:
+        return {"message": "No missed medications found for the user."}
+
+    return {
         "message": "Notifications sent for missed medications.",
         "missed_medications": missed_meds_names
-    }), 200
+    }
+
+
+@medication_bp.route('/missed', methods=['GET'])
+@jwt_required
+def send_missed_medication_notifications():
+    """
+    Fetches all missed medications for the given user and sends notifications to caregivers.
+    Returns the names of all missed medications for the user.
+    """
+    user_id = request.user_id  # Assuming user_id is passed in the request
+
+    # Fetch all missed medications for the user
+    missed = medication_summary(user_id, ["missed"], fields=["name"])["missed"]["medications"]
+    return jsonify(missed_response(missed)), 200
 
 @medication_bp.route('/clear', methods=['DELETE'])
 @jwt_required
@@ -159,22 +471,18 @@ def delete_medications():
     user_id = request.user_id  # Assuming user_id is passed in the request
 
     # Fetch all missed medications for the user
-    missed_medications = mongo.db.medications.find({"user_id": user_id, "status": "missed"})
-
-    missed_meds_names = []
-
-    # Collect the names of missed medications
-    for med in missed_medications:
-        medication_name = decrypt_data(med.get("name"))
-        if medication_name:
-            missed_meds_names.append(medication_name)
+    missed = medication_summary(user_id, ["missed"], fields=["name"])["missed"]["medications"]
 
     # If no missed medications found, return a message
-    if not missed_meds_names:
+    if not any(med["name"] for med in missed):
         return jsonify({"message": "No missed medications found for the user."}), 200
 
-    # Clear the missed medications from the database
-    mongo.db.medications.delete_many({"user_id": user_id, "status": "missed"})
+    # Clear exactly the missed medications that were fetched
+    missed_med_ids = [med["_id"] for med in missed]
+    mongo.db.medications.delete_many({"_id": {"$in": [ObjectId(med_id) for med_id in missed_med_ids]}, "user_id": user_id})
+
+    # Drop their future doses; taken/missed dose history is kept
+    delete_upcoming_doses(missed_med_ids)
 
     # Return the list of missed medications that were cleared
     return jsonify({
@@ -190,25 +498,92 @@ def upcoming():
     """
     user_id = request.user_id  # Assuming user_id is passed in the request
 
-    # Fetch all missed medications for the user
-    missed_medications = mongo.db.medications.find({"user_id": user_id, "status": "upcoming"})
+    # Fetch all upcoming medications for the user
+    upcoming_meds = medication_summary(user_id, ["upcoming"], fields=["name", "time"])["upcoming"]["medications"]
+    return jsonify(upcoming_response(upcoming_meds)), 200
 
-    missed_meds_names = []
 
-    for med in missed_medications:
-        medication_name = decrypt_data(med.get("name"))
-        missed_time = decrypt_data(med.get("time"))  # Assuming timestamp is stored in the document
-        if medication_name and missed_time:
-            missed_meds_names.append({"name": medication_name, "time": missed_time})
+@medication_bp.route('/doses', methods=['GET'])
+@jwt_required
+def get_dose_schedule():
+    """
+    Returns the authenticated user's dose instances between `start` and `end`
+    (ISO 8601, default: today until the end of the generated horizon) for calendar views.
+    """
+    user_id = request.user_id  # Extracted from JWT
+
+    try:
+        start, end = parse_dose_range(request.args)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid date: {e}"}), 400
 
+    doses = get_doses(user_id, start, end)
 
-    if not missed_meds_names:
-        return jsonify({"message": "No missed medications found for the user."}), 200
+    # Decrypt each medication name once, in a single batch
+    medication_ids = list({ObjectId(dose["medication_id"]) for dose in doses})
+    medications = mongo.db.medications.find({"_id": {"$in": medication_ids}, "user_id": user_id})
+    names = {str(med["_id"]): med["name"] for med in decrypt_documents(medications, fields=["name"])}
 
+    return jsonify(doses_response(doses, names)), 200
 
-    return jsonify({
-        "message": "Notifications sent for missed medications.",
-        "missed_medications": missed_meds_names
-    }), 200
 
+def parse_dose_range(args):
+    """(start, end) of the /doses range; raises ValueError for invalid dates."""
+    now = datetime.now(timezone.utc)
+    start = datetime.fromisoformat(args["start"]) if "start" in args else now.replace(hour=0, minute=0, second=0, microsecond=0)
+    end = datetime.fromisoformat(args["end"]) if "end" in args else now + timedelta(days=DOSE_HORIZON_DAYS)
+    return start, end
+
+
+def doses_response(doses, names):
+    return {
+        "doses": [
+            {
+                "_id": str(dose["_id"]),
+                "medication_id": dose["medication_id"],
+                "name": names.get(dose["medication_id"]),
+                "due_at": dose["due_at"].isoformat() + "Z",
+                "status": dose["status"],
+            }
+            for dose in doses
+        ]
+    }
+
+
+ADHERENCE_DEFAULT_DAYS = 7
+ADHERENCE_MAX_DAYS = 366
+
+
+@medication_bp.route('/adherence', methods=['GET'])
+@jwt_required
+def get_adherence_range():
+    """
+    Returns taken / missed / upcoming counts and adherence per day and per
+    medication between `start` and `end` (ISO dates, inclusive; default: the
+    last 7 days), read from the precomputed rollups.
+    Optional `medication_id`; caregivers pass the `patient_id` of an assigned patient.
+    """
+    user_id = request.user_id  # Extracted from JWT
+
+    patient_id = request.args.get("patient_id")
+    if patient_id and patient_id != user_id:
+        # Caregivers may only read their own patients' adherence
+        caregiver = get_user(user_id) or {}
+        assigned = (caregiver.get("profile") or {}).get("patients_assigned") or []
+        assigned = assigned if isinstance(assigned, list) else [assigned]
+        if caregiver.get("role") != "caregiver" or patient_id not in assigned:
+            return jsonify({"message": "Patient not assigned"}), 403
+        user_id = patient_id
+
+    try:
+        today = datetime.now(timezone.utc).date()
+        end = date.fromisoformat(request.args["end"]) if "end" in request.args else today
+        start = date.fromisoformat(request.args["start"]) if "start" in request.args else end - timedelta(days=ADHERENCE_DEFAULT_DAYS - 1)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid date: {e}"}), 400
+
+    if start > end or (end - start).days >= ADHERENCE_MAX_DAYS:
+        return jsonify({"error": f"Date range must be between 1 and {ADHERENCE_MAX_DAYS} days"}), 400
 
+    rollups = get_adherence(user_id, start.isoformat(), end.isoformat(), request.args.get("medication_id"))
+    return jsonify({"start": start.isoformat(), "end": end.isoformat(), **summarize_adherence(rollups)}), 200
@@ -0,0 +1,111 @@
+import base64
+import binascii
+from datetime import datetime, timezone
+from bson import ObjectId
+from bson.errors import InvalidId
+from flask import Blueprint, request, jsonify
+from pymongo import DESCENDING
+from app.database import mongo
+from app.utils.jwt_util import jwt_required
+
+notification_bp = Blueprint('notification', __name__)
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+# Fields a client may request with `fields=`
+PROJECTABLE_FIELDS = {"patient_id", "caregiver_id", "medication_name", "medication_names", "title", "body", "timestamp", "status", "read_at"}
+
+
+def owner_filter():
+    """Caregivers see notifications sent to them, everyone else the ones about themselves."""
+    owner_field = "caregiver_id" if request.role == "caregiver" else "patient_id"
+    return {owner_field: request.user_id}
+
+
+def encode_cursor(notification):
+    """Opaque cursor pointing just after `notification` in (timestamp desc, _id desc) order."""
+    raw = f"{notification['timestamp'].isoformat()}|{notification['_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor; raises ValueError for anything that is not one of our cursors."""
+    try:
+        timestamp, notification_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(timestamp), ObjectId(notification_id)
+    except (binascii.Error, UnicodeDecodeError, InvalidId, ValueError):
+        raise ValueError("malformed cursor")
+
+
+@notification_bp.route('/', methods=['GET'])
+@jwt_required
+def get_notifications():
+    """
+    Returns one page of the user's notification history, newest first.
+    Query params: `limit`, `cursor` (from the previous page's `next_cursor`)
+    and `fields` (comma-separated projection).
+    """
+    try:
+        limit = min(int(request.args.get("limit", DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        query = owner_filter()
+
+        # Keyset pagination: continue strictly after the last item of the previous page
+        cursor = request.args.get("cursor")
+        if cursor:
+            timestamp, last_id = decode_cursor(cursor)
+            query["$or"] = [
+                {"timestamp": {"$lt": timestamp}},
+                {"timestamp": timestamp, "_id": {"$lt": last_id}},
+            ]
+
+        projection = None
+        if request.args.get("fields"):
+            requested = set(request.args["fields"].split(",")) & PROJECTABLE_FIELDS
+            projection = {field: 1 for field in requested | {"timestamp"}}  # timestamp is needed for the cursor
+
+        notifications = list(
+            mongo.db.notifications.find(query, projection)
+            .sort([("timestamp", DESCENDING), ("_id", DESCENDING)])
+            .limit(limit + 1)
+        )
+        has_more = len(notifications) > limit
+        notifications = notifications[:limit]
+        next_cursor = encode_cursor(notifications[-1]) if has_more else None
+
+        for notification in notifications:
+            notification["_id"] = str(notification["_id"])
+
+        return jsonify({
+            "notifications": notifications,
+            "next_cursor": next_cursor,
+        }), 200
+
+    except (ValueError, TypeError) as e:
+        return jsonify({"error": f"Invalid pagination parameters: {e}"}), 400
+
+
+@notification_bp.route('/unread-count', methods=['GET'])
+@jwt_required
+def get_unread_count():
+    """Returns how many of the user's notifications are unread."""
+    count = mongo.db.notifications.count_documents({**owner_filter(), "read_at": None})
+    return jsonify({"unread": count}), 200
+
+
+@notification_bp.route('/read', methods=['PUT'])
+@jwt_required
+def mark_notifications_read():
+    """Marks the given notification `ids` (or all of them if none are given) as read."""
+    data = request.json or {}
+    query = {**owner_filter(), "read_at": None}
+
+    try:
+        if data.get("ids"):
+            query["_id"] = {"$in": [ObjectId(notification_id) for notification_id in data["ids"]]}
+    except Exception as e:
+        return jsonify({"error": f"Invalid notification id: {e}"}), 400
+
+    result = mongo.db.notifications.update_many(query, {"$set": {"read_at": datetime.now(timezone.utc)}})
+    return jsonify({"message": "Notifications marked as read", "updated": result.modified_count}), 200
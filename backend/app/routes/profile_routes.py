@@ -5,10 +5,32 @@ from app.schemas.user_schema import ProfileSchema
 from app.schemas.patient_schema import PatientProfileSchema
 from app.schemas.caregiver_schema import CaregiverProfileSchema
 from app.utils.jwt_util import jwt_required
-from app.utils.encryption import encrypt_profile_data , encrypt_data, decrypt_data, decrypt_profile_data# Import encryption function
+from app.utils.notification import invalidate_caregiver_cache
+from app.utils.caregivers import add_patients_expr, remove_patient_expr
+from app.utils.user_cache import get_user, invalidate_user
+from app.utils.encryption import encrypt_profile_data , encrypt_data, decrypt_data, decrypt_profile_data, encrypt_document # Import encryption function
 
 profile_bp = Blueprint('profile', __name__)
 
+
+def pop_patient_emails(profile):
+    """Removes and returns the patient email(s) given as `email` and/or `emails` in a caregiver profile."""
+    emails = list(profile.pop("emails", None) or [])
+    email = profile.pop("email", None)
+    if email:
+        emails.append(email)
+    return list(dict.fromkeys(emails))  # Drop duplicates, keep order
+
+
+def find_patients_by_email(emails):
+    """
+    Resolves patient emails to IDs with one `$in` query.
+    Returns (patient_ids, missing_emails).
+    """
+    patients = list(mongo.db.users.find({"email": {"$in": emails}, "role": "patient"}, {"email": 1}))
+    found = {patient["email"] for patient in patients}
+    return [str(patient["_id"]) for patient in patients], [email for email in emails if email not in found]
+
 @profile_bp.route('/register', methods=['POST'])
 @jwt_required
 def register_profile():
@@ -20,8 +42,8 @@ def register_profile():
     if not user_id:
         return jsonify({"message": "Unauthorized"}), 401
 
-    # Fetch user from database
-    user = mongo.db.users.find_one({"_id": ObjectId(user_id)})
+    # Fetch user (cached)
+    user = get_user(user_id)
     if not user:
         return jsonify({"message": "User not found"}), 404
 
@@ -36,41 +58,49 @@ def register_profile():
         if data["role"] == "patient":
             print(data["profile"])
             validated_data = PatientProfileSchema(**data["profile"])
-            profile_data = encrypt_profile_data(validated_data.dict())  # Encrypt for patients
+            profile_data = encrypt_document(validated_data.dict())  # Encrypt for patients
         elif data["role"] == "caregiver":
             # Remove unwanted fields before validation
-            patient_email = data["profile"].pop("email", None)  # Extract and remove email
+            patient_emails = pop_patient_emails(data["profile"])  # Extract and remove email(s)
             data["profile"].pop("name", None)  # Remove name if present to avoid Pydantic errors
 
-            if not patient_email:
+            if not patient_emails:
                 return jsonify({"message": "Patient email is required"}), 400
 
             # Validate remaining profile data with Pydantic
             validated_data = CaregiverProfileSchema(**data["profile"])
             profile_data = validated_data.dict()  # No encryption for caregivers
 
-            # Find patient by email
-            patient = mongo.db.users.find_one({"email": patient_email, "role": "patient"})
-            if not patient:
-                return jsonify({"message": "Patient with this email not found"}), 404
+            # Find every patient by email in one query
+            patient_ids, missing = find_patients_by_email(patient_emails)
+            if missing:
+                return jsonify({"message": "Patient with this email not found", "emails": missing}), 404
 
-            assigned_patient_id = str(patient["_id"])  # Convert ObjectId to string
-
-            # Add the assigned patient ID to profile
-            profile_data["patients_assigned"] = assigned_patient_id
+            # Add the assigned patient IDs to profile
+            profile_data["patients_assigned"] = patient_ids
 
         else:
             return jsonify({"message": "Invalid role"}), 400
 
-        # Update user role and store profile in database
-        mongo.db.users.update_one(
-            {"_id": ObjectId(user_id)},
+        # Update user role and store profile in database; the role condition
+        # guards against a cached "general" role that is already stale
+        result = mongo.db.users.update_one(
+            {"_id": ObjectId(user_id), "role": "general"},
             {"$set": {
                 "role": data["role"],  # Store role without encryption
                 "profile": profile_data  # Store profile based on role
             }}
         )
 
+        # Role and profile changed
+        invalidate_user(user_id)
+        if not result.matched_count:
+            return jsonify({"message": "Profile already registered"}), 403
+
+        # Notification fan-out must see the new caregiver straight away
+        if data["role"] == "caregiver":
+            invalidate_caregiver_cache(profile_data["patients_assigned"])
+
         return jsonify({"message": "Profile registered successfully"}), 200
 
     except Exception as e:
@@ -89,8 +119,8 @@ def get_profile():
         return jsonify({"message": "Unauthorized"}), 401
 
     try:
-        # Fetch user from the database
-        user = mongo.db.users.find_one({"_id": ObjectId(user_id)})
+        # Fetch user (cached)
+        user = get_user(user_id)
         if not user:
             return jsonify({"message": "User not found"}), 404
 
@@ -115,3 +145,46 @@ def get_profile():
 
 
 
+@profile_bp.route('/patients', methods=['POST'])
+@jwt_required
+def assign_patients():
+    """Assigns more patients (by `emails`) to the authenticated caregiver."""
+    if request.role != "caregiver":
+        return jsonify({"message": "Only caregivers can be assigned patients"}), 403
+
+    patient_emails = pop_patient_emails(dict(request.json or {}))
+    if not patient_emails:
+        return jsonify({"message": "Patient email is required"}), 400
+
+    patient_ids, missing = find_patients_by_email(patient_emails)
+    if missing:
+        return jsonify({"message": "Patient with this email not found", "emails": missing}), 404
+
+    mongo.db.users.update_one(
+        {"_id": ObjectId(request.user_id), "role": "caregiver"},
+        [{"$set": {"profile.patients_assigned": add_patients_expr(patient_ids)}}],
+    )
+    invalidate_user(request.user_id)
+    invalidate_caregiver_cache(patient_ids)
+
+    return jsonify({"message": "Patients assigned successfully", "patients_assigned": patient_ids}), 200
+
+
+@profile_bp.route('/patients/<patient_id>', methods=['DELETE'])
+@jwt_required
+def unassign_patient(patient_id):
+    """Removes a patient from the authenticated caregiver's caseload."""
+    if request.role != "caregiver":
+        return jsonify({"message": "Only caregivers can be assigned patients"}), 403
+
+    result = mongo.db.users.update_one(
+        {"_id": ObjectId(request.user_id), "role": "caregiver", "profile.patients_assigned": patient_id},
+        [{"$set": {"profile.patients_assigned": remove_patient_expr(patient_id)}}],
+    )
+    if not result.modified_count:
+        return jsonify({"message": "Patient not assigned"}), 404
+
+    invalidate_user(request.user_id)
+
+    invalidate_caregiver_cache(patient_id)
+    return jsonify({"message": "Patient unassigned"}), 200
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import BaseModel, Field, validator
+from typing import Optional, List
 
 class CaregiverProfileSchema(BaseModel):
     age: int = Field(..., gt=18, lt=100)  # Caregiver must be an adult
@@ -7,5 +7,12 @@ class CaregiverProfileSchema(BaseModel):
     relation_to_patient: Optional[str] = None
     experience: Optional[int] = 0  # Years of experience
     certifications: Optional[list[str]] = []
-    patients_assigned: Optional[str]  # Single assigned patient ID
+    patients_assigned: Optional[List[str]] = []  # Assigned patient IDs
     fcm_token: Optional[str] = Field()
+
+    @validator("patients_assigned", pre=True)
+    def single_patient_as_list(cls, value):
+        """Profiles stored before caregivers had several patients hold a single ID."""
+        if value is None:
+            return []
+        return [value] if isinstance(value, str) else value
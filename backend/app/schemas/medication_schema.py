@@ -11,4 +11,5 @@ class MedicationSchema(BaseModel):
     status: Literal['taken', 'missed', 'upcoming'] = Field(..., description="Current medication status")
     refill_date: Optional[str] = Field(None, description="Date for the next refill, if applicable")
     low_supply: Optional[bool] = Field(False, description="Indicates if the medication is running low")
-    notification: Optional[bool] = Field(False)
\ No newline at end of file
+    notification: Optional[bool] = Field(False)
+    timezone: Optional[str] = Field(None, description="IANA time zone the dose time is in (e.g. 'Asia/Kolkata')")
\ No newline at end of file
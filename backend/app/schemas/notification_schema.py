@@ -10,3 +10,4 @@ class NotificationSchema(BaseModel):
     body: str = Field(..., description="Body content of the notification")
     timestamp: datetime = Field(default_factory=datetime.utcnow, description="Time when the notification was sent")
     status: str = Field(default="pending", description="Notification status (sent, failed, pending, etc.)")
+    read_at: Optional[datetime] = Field(None, description="Time when the recipient marked the notification as read")
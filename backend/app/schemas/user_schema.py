@@ -9,6 +9,7 @@ class UserSchema(BaseModel):
     phone: constr(min_length=10, max_length=15)
     password: constr(min_length=6)
     role: Literal["general", "patient", "caregiver"] = "general"  # Default role before updating
+    timezone: Optional[str] = None  # IANA time zone used for medication schedules
 
 
 class ProfileSchema(BaseModel):
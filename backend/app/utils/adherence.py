@@ -0,0 +1,140 @@
+from collections import Counter
+from pymongo import ASCENDING, UpdateOne
+from app.database import mongo
+from app.utils.schedule import get_timezone, _as_utc
+
+# Per patient, per local day, per medication dose counters in the `adherence`
+# collection: {user_id, day: "YYYY-MM-DD", medication_id, taken, missed, upcoming}.
+# Kept in step with the `doses` collection by $inc on every status change;
+# `flask rebuild-adherence` recomputes them from the doses. The $inc assumes a
+# rollup already counts its doses, so on a database with doses from before the
+# rollups existed, run `flask rebuild-adherence` once before starting the
+# scheduler (it also gives those doses their medication's timezone).
+ADHERENCE_STATUSES = ("taken", "missed", "upcoming")
+REBUILD_BATCH_SIZE = 500
+
+
+def adherence_day(due_at, tz_name=None):
+    """The patient's local calendar day (ISO date) a dose falls on."""
+    return _as_utc(due_at).astimezone(get_timezone(tz_name)).date().isoformat()
+
+
+def _key(dose):
+    return dose["user_id"], adherence_day(dose["due_at"], dose.get("timezone")), dose["medication_id"]
+
+
+def _upsert(key, update):
+    user_id, day, medication_id = key
+    return UpdateOne({"user_id": user_id, "day": day, "medication_id": medication_id}, update, upsert=True)
+
+
+def record_transitions(transitions):
+    """
+    Applies dose status changes to the rollups. `transitions` are
+    (dose, old_status, new_status) with None for a dose that did not exist
+    before / no longer exists. Changes to the same rollup are merged into
+    one $inc, and all rollups are written with one bulk write.
+    """
+    increments = {}
+    for dose, old_status, new_status in transitions:
+        counts = increments.setdefault(_key(dose), Counter())
+        if old_status:
+            counts[old_status] -= 1
+        if new_status:
+            counts[new_status] += 1
+
+    operations = [
+        _upsert(key, {"$inc": {status: counts.get(status, 0) for status in ADHERENCE_STATUSES}})
+        for key, counts in increments.items()
+        if any(counts.values())
+    ]
+    if operations:
+        mongo.db.adherence.bulk_write(operations, ordered=False)
+
+
+def get_adherence(user_id, start_day, end_day, medication_id=None):
+    """Rollups of a patient for days in [start_day, end_day] (ISO dates), oldest first."""
+    query = {"user_id": user_id, "day": {"$gte": start_day, "$lte": end_day}}
+    if medication_id:
+        query["medication_id"] = medication_id
+    return list(mongo.db.adherence.find(query, {"_id": 0}).sort("day", ASCENDING))
+
+
+def summarize_adherence(rollups):
+    """
+    Per-day and per-medication totals for the adherence chart. `adherence` is
+    the share of due doses (taken + missed) that were taken, in percent.
+    """
+    def totals(rows):
+        counts = {status: sum(row.get(status, 0) for row in rows) for status in ADHERENCE_STATUSES}
+        due = counts["taken"] + counts["missed"]
+        counts["adherence"] = round(counts["taken"] * 100 / due, 1) if due else None
+        return counts
+
+    by_day = {}
+    by_medication = {}
+    for row in rollups:
+        by_day.setdefault(row["day"], []).append(row)
+        by_medication.setdefault(row["medication_id"], []).append(row)
+
+    return {
+        "days": [{"day": day, **totals(rows)} for day, rows in by_day.items()],
+        "medications": {medication_id: totals(rows) for medication_id, rows in by_medication.items()},
+        "total": totals(rollups),
+    }
+
+
+def _rebuild_user(user_id, doses):
+    """
+    Overwrites each of the patient's rollups with a $set upsert and drops the
+    ones no dose maps to any more, so readers never see the patient without
+    rollups. An $inc landing between the count and its $set is still lost,
+    which is why the command refuses to run while the scheduler is live.
+    """
+    counts = {}
+    for dose in doses:
+        counts.setdefault(_key(dose), Counter())[dose["status"]] += 1
+
+    if counts:
+        mongo.db.adherence.bulk_write([
+            _upsert(key, {"$set": {status: counter.get(status, 0) for status in ADHERENCE_STATUSES}})
+            for key, counter in counts.items()
+        ], ordered=False)
+
+    stale = [
+        rollup["_id"]
+        for rollup in mongo.db.adherence.find({"user_id": user_id}, {"day": 1, "medication_id": 1})
+        if (user_id, rollup["day"], rollup["medication_id"]) not in counts
+    ]
+    if stale:
+        mongo.db.adherence.delete_many({"_id": {"$in": stale}})
+    return len(counts)
+
+
+def rebuild_adherence(user_id=None):
+    """
+    Recomputes the rollups of one patient (or all of them) from the `doses`
+    collection, one patient at a time in (user_id, due_at) index order.
+    Returns the number of rollup documents written.
+    """
+    query = {"user_id": user_id} if user_id else {}
+    doses = mongo.db.doses.find(
+        query, {"user_id": 1, "medication_id": 1, "due_at": 1, "status": 1, "timezone": 1},
+    ).sort([("user_id", ASCENDING), ("due_at", ASCENDING)]).batch_size(REBUILD_BATCH_SIZE)
+
+    if not user_id:
+        mongo.db.adherence.delete_many({"user_id": {"$nin": mongo.db.doses.distinct("user_id")}})
+
+    written = 0
+    current_user, current_doses = None, []
+    for dose in doses:
+        if dose["user_id"] != current_user and current_doses:
+            written += _rebuild_user(current_user, current_doses)
+            current_doses = []
+        current_user = dose["user_id"]
+        current_doses.append(dose)
+    if current_doses:
+        written += _rebuild_user(current_user, current_doses)
+    elif user_id:
+        mongo.db.adherence.delete_many({"user_id": user_id})
+    return written
@@ -0,0 +1,82 @@
+from pymongo import ASCENDING, UpdateOne
+from app.database import mongo
+from app.utils.encryption import blind_index, decrypt_documents, BLIND_INDEX_ENABLED
+from pymongo.errors import OperationFailure
+
+# Encrypted medication field -> plaintext blind index stored next to it.
+# Only names: a keyed hash of a low-entropy value such as an HH:MM time would
+# reveal which medications share a dose time, across all users.
+MEDICATION_BLIND_INDEXES = {
+    "name": "name_bidx",
+}
+# Removed blind index, unset (with its MongoDB index) by the backfill
+LEGACY_TIME_INDEX = "time_bidx"
+
+BACKFILL_BATCH_SIZE = 500
+
+
+def normalize_name(name):
+    """Case and whitespace insensitive form of a medication name."""
+    return " ".join(str(name).split()).lower()
+
+
+def medication_blind_indexes(medication: dict) -> dict:
+    """
+    Computes the blind index fields for a plaintext medication.
+    Returns an empty dict when blind indexes are disabled.
+    """
+    if not BLIND_INDEX_ENABLED:
+        return {}
+
+    indexes = {}
+    if medication.get("name"):
+        indexes["name_bidx"] = blind_index("medication.name", normalize_name(medication["name"]))
+    return indexes
+
+
+def name_index_query(name):
+    """Equality filter matching medications with the given name."""
+    return {"name_bidx": blind_index("medication.name", normalize_name(name))}
+
+
+def backfill_medication_blind_indexes(batch_size=BACKFILL_BATCH_SIZE):
+    """
+    Adds blind index fields to medications stored before they existed and
+    removes the retired time index. Works in batches and only touches
+    documents still missing an index, so it can be stopped and re-run safely.
+    """
+    from app.utils.indexes import ensure_indexes
+    ensure_indexes(["medications"])
+
+    try:
+        mongo.db.medications.drop_index([("status", ASCENDING), (LEGACY_TIME_INDEX, ASCENDING)])
+    except OperationFailure:
+        pass  # Already dropped
+    mongo.db.medications.update_many({LEGACY_TIME_INDEX: {"$exists": True}}, {"$unset": {LEGACY_TIME_INDEX: ""}})
+
+    missing = {"$or": [{field: {"$exists": False}} for field in MEDICATION_BLIND_INDEXES.values()]}
+    updated = 0
+    last_id = None
+
+    while True:
+        query = dict(missing)
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        batch = list(mongo.db.medications.find(query).sort("_id", ASCENDING).limit(batch_size))
+        if not batch:
+            break
+
+        operations = []
+        for med in decrypt_documents(batch, fields=list(MEDICATION_BLIND_INDEXES)):
+            indexes = medication_blind_indexes(med)
+            if indexes:
+                operations.append(UpdateOne({"_id": med["_id"]}, {"$set": indexes}))
+
+        if operations:
+            mongo.db.medications.bulk_write(operations, ordered=False)
+            updated += len(operations)
+
+        last_id = batch[-1]["_id"]
+        print(f"Backfilled blind indexes for {updated} medications so far")
+
+    return updated
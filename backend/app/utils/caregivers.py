@@ -0,0 +1,121 @@
+from collections import Counter
+from bson import ObjectId
+from app.database import mongo
+from app.utils.encryption import decrypt_documents, SEALED_FIELD
+from app.utils.medication_summary import MEDICATION_STATUSES
+
+# Medication fields the dashboard shows; only these are decrypted
+DASHBOARD_FIELDS = ("name", "time")
+
+# A caregiver's patients_assigned as an array in aggregation / update pipelines,
+# whether it is stored as a list, a single legacy ID string or is missing
+ASSIGNED_PATIENTS_EXPR = {"$switch": {
+    "branches": [
+        {"case": {"$isArray": "$profile.patients_assigned"}, "then": "$profile.patients_assigned"},
+        {"case": {"$eq": [{"$type": "$profile.patients_assigned"}, "string"]}, "then": ["$profile.patients_assigned"]},
+    ],
+    "default": [],
+}}
+
+
+def add_patients_expr(patient_ids):
+    """Appends the patient IDs not assigned yet, keeping the assignment order ($setUnion does not)."""
+    return {"$let": {"vars": {"assigned": ASSIGNED_PATIENTS_EXPR}, "in": {"$concatArrays": [
+        "$$assigned",
+        {"$filter": {"input": list(dict.fromkeys(patient_ids)), "cond": {"$not": [{"$in": ["$$this", "$$assigned"]}]}}},
+    ]}}}
+
+
+def remove_patient_expr(patient_id):
+    """Drops one patient ID, keeping the order of the others ($setDifference does not)."""
+    return {"$filter": {"input": ASSIGNED_PATIENTS_EXPR, "cond": {"$ne": ["$$this", patient_id]}}}
+
+
+def dashboard_pipeline(caregiver_id):
+    """
+    One aggregation from the caregiver's user document, yielding one document
+    per assigned patient (in assignment order) so no single result grows with
+    the whole caseload. Each patient's `$lookup`s are indexed equality matches
+    (users._id, medications.user_id) returning only the dashboard fields of
+    current medications. A caregiver without patients yields one document
+    without `patient_id`; anyone else yields none.
+    """
+    medication_fields = {"_id": 1, "user_id": 1, "status": 1, "next_due_at": 1, SEALED_FIELD: 1}
+    medication_fields.update({field: 1 for field in DASHBOARD_FIELDS})
+
+    return [
+        {"$match": {"_id": ObjectId(caregiver_id), "role": "caregiver"}},
+        {"$project": {"patient_keys": ASSIGNED_PATIENTS_EXPR}},
+        {"$unwind": {"path": "$patient_keys", "preserveNullAndEmptyArrays": True}},
+        {"$project": {
+            "_id": 0,
+            "patient_id": "$patient_keys",
+            "patient_oid": {"$convert": {"input": "$patient_keys", "to": "objectId", "onError": None, "onNull": None}},
+        }},
+        {"$lookup": {
+            "from": "users",
+            "let": {"patient_oid": "$patient_oid"},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$_id", "$$patient_oid"]}}},
+                {"$project": {"name": 1, "role": 1}},
+            ],
+            "as": "patient",
+        }},
+        {"$lookup": {
+            "from": "medications",
+            "let": {"patient_id": "$patient_id"},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$user_id", "$$patient_id"]}, "status": {"$in": list(MEDICATION_STATUSES)}}},
+                {"$project": medication_fields},
+            ],
+            "as": "medications",
+        }},
+        {"$project": {"patient_id": 1, "patient": {"$arrayElemAt": ["$patient", 0]}, "medications": 1}},
+    ]
+
+
+def caregiver_dashboard(caregiver_id):
+    """
+    Current medication status of every patient assigned to a caregiver.
+    Medications are decrypted in one batch, DASHBOARD_FIELDS only.
+    Returns a list of {"patient_id", "name", "counts", "medications"} in
+    assignment order, or None if `caregiver_id` is not a caregiver.
+    """
+    rows = list(mongo.db.users.aggregate(dashboard_pipeline(caregiver_id)))
+    if not rows:
+        return None
+
+    patients = {}
+    medications = []
+    for row in rows:
+        patient = row.get("patient")
+        if not row.get("patient_id") or row["patient_id"] in patients:
+            continue  # No patients, or assigned twice
+        if patient is None or patient.get("role") != "patient":
+            continue  # Deleted or no longer a patient
+        patients[row["patient_id"]] = patient
+        medications.extend(row["medications"])
+
+    medications_by_patient = {}
+    for med in decrypt_documents(medications, fields=list(DASHBOARD_FIELDS)):
+        medications_by_patient.setdefault(med["user_id"], []).append({
+            "_id": str(med["_id"]),
+            "status": med.get("status"),
+            "next_due_at": med.get("next_due_at"),
+            **{field: med.get(field) for field in DASHBOARD_FIELDS},
+        })
+
+    dashboard = []
+    for patient_id, patient in patients.items():
+        medications = sorted(
+            medications_by_patient.get(patient_id, []),
+            key=lambda med: (med["next_due_at"] is None, med["next_due_at"] or 0),
+        )
+        counts = Counter(med["status"] for med in medications)
+        dashboard.append({
+            "patient_id": patient_id,
+            "name": patient.get("name"),
+            "counts": {status: counts.get(status, 0) for status in MEDICATION_STATUSES},
+            "medications": medications,
+        })
+    return dashboard
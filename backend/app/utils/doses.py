@@ -0,0 +1,193 @@
+import os
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+from pymongo.errors import BulkWriteError
+from app.database import mongo
+from app.utils.encryption import decrypt_documents
+from app.utils.adherence import record_transitions
+from app.utils.schedule import dose_times
+from app.utils.lease import fence_write
+
+# Dose instances are generated this far ahead of now
+DOSE_HORIZON_DAYS = int(os.getenv("DOSE_HORIZON_DAYS", 7))
+# How far ahead of its due time a dose can be marked as taken
+DOSE_TAKE_WINDOW_MINUTES = int(os.getenv("DOSE_TAKE_WINDOW_MINUTES", 120))
+DUPLICATE_KEY_ERROR = 11000
+# Fencing token of the sweep lease, stamped on the doses and medications the sweep writes
+SWEEP_TOKEN_FIELD = "sweep_token"
+# Per-call claim id, stamped by a bulk status change so the adherence rollups
+# are updated for exactly the doses that call changed, not concurrent ones
+CLAIM_FIELD = "claim"
+DOSE_FIELDS = {"_id": 1, "medication_id": 1, "user_id": 1, "due_at": 1, "timezone": 1}
+
+
+def _dose_documents(medication, time_str, frequency, start, until):
+    """Builds the upcoming dose instances of one medication between `start` and `until`."""
+    medication_id = str(medication["_id"])
+    return [
+        {
+            "medication_id": medication_id,
+            "user_id": medication["user_id"],
+            "due_at": due_at,
+            "status": "upcoming",
+            "timezone": medication.get("timezone"),  # Local day for the adherence rollups
+        }
+        for due_at in dose_times(time_str, frequency, medication.get("timezone"), start, until,
+                                 anchor=medication["_id"].generation_time)
+    ]
+
+
+def materialize_doses(medication, time_str, frequency, until=None):
+    """
+    Inserts dose instances for one medication from where generation last stopped
+    up to `until` (default: now + DOSE_HORIZON_DAYS). `time_str` and `frequency`
+    are the decrypted schedule. Safe to repeat: (medication_id, due_at) is unique.
+    Returns the number of doses inserted.
+    """
+    return materialize_doses_many([(medication, time_str, frequency)], until)
+
+
+def materialize_doses_many(schedules, until=None):
+    """
+    Bulk variant of materialize_doses for (medication, time_str, frequency)
+    triples, e.g. a batch import: one insert_many for all doses and one
+    update_many for the generated horizon.
+    """
+    now = datetime.now(timezone.utc)
+    until = until or now + timedelta(days=DOSE_HORIZON_DAYS)
+
+    doses = []
+    for medication, time_str, frequency in schedules:
+        start = medication.get("doses_generated_until") or now
+        doses.extend(_dose_documents(medication, time_str, frequency, start, until))
+
+    inserted = []
+    if doses:
+        try:
+            mongo.db.doses.insert_many(doses, ordered=False)
+            inserted = doses
+        except BulkWriteError as e:
+            write_errors = e.details.get("writeErrors", [])
+            failed = {error["index"] for error in write_errors}
+            inserted = [dose for index, dose in enumerate(doses) if index not in failed]
+            # Duplicates mean another run already generated them; anything else
+            # is raised, after counting the doses that did go in
+            if any(error["code"] != DUPLICATE_KEY_ERROR for error in write_errors):
+                record_transitions((dose, None, "upcoming") for dose in inserted)
+                raise
+        record_transitions((dose, None, "upcoming") for dose in inserted)
+
+    if schedules:
+        mongo.db.medications.update_many(
+            {"_id": {"$in": [medication["_id"] for medication, _, _ in schedules]}},
+            {"$set": {"doses_generated_until": until}},
+        )
+    return len(inserted)
+
+
+def extend_dose_horizon():
+    """
+    Tops up dose instances for every medication whose generated horizon is
+    running out, decrypting only the schedule fields in one batch.
+    """
+    now = datetime.now(timezone.utc)
+    until = now + timedelta(days=DOSE_HORIZON_DAYS)
+    refresh_before = until - timedelta(days=1)
+
+    medications = mongo.db.medications.find(
+        {"$or": [
+            {"doses_generated_until": {"$lt": refresh_before}},
+            {"doses_generated_until": {"$exists": False}},
+        ]}
+    )
+
+    inserted = 0
+    for med in decrypt_documents(medications, fields=["time", "frequency"]):
+        try:
+            inserted += materialize_doses(med, med["time"], med["frequency"], until=until)
+        except ValueError as e:
+            # Legacy free-text time: skip it instead of aborting the top-up for everyone
+            print(f"Skipping medication {med['_id']} with unparseable time: {e}")
+
+    if inserted:
+        print(f"Generated {inserted} dose instances.")
+    return inserted
+
+
+def mark_overdue_doses_missed(now=None, fencing_token=None):
+    """
+    Marks every upcoming dose whose due time has passed as missed. With a
+    `fencing_token` (the sweep lease's), the writes are fenced on it.
+    Returns the dose documents touched.
+    """
+    now = now or datetime.now(timezone.utc)
+    overdue = [dose["_id"] for dose in mongo.db.doses.find({"status": "upcoming", "due_at": {"$lte": now}}, {"_id": 1})]
+    if not overdue:
+        return []
+
+    query = {"_id": {"$in": overdue}, "status": "upcoming"}
+    update = {"$set": {"status": "missed"}}
+    if fencing_token is not None:
+        query, update = fence_write(query, update, fencing_token, SWEEP_TOKEN_FIELD)
+    missed = _claim_doses(query, update)
+    record_transitions((dose, "upcoming", "missed") for dose in missed)
+    return missed
+
+
+def _claim_doses(query, update):
+    """
+    Applies `update` to the doses matching `query` and returns exactly the
+    doses this call changed: doses taken or fired by the timer in between do
+    not match `query` any more, so they are not stamped with this claim.
+    """
+    claim = ObjectId()
+    update = {**update, "$set": {**update["$set"], CLAIM_FIELD: claim}}
+    mongo.db.doses.update_many(query, update)
+    return list(mongo.db.doses.find({"_id": query["_id"], CLAIM_FIELD: claim}, DOSE_FIELDS))
+
+
+def mark_dose_taken(medication_id, user_id, now=None):
+    """
+    Marks the latest dose of a medication that is due (or due within the take
+    window) as taken. Returns the updated dose, or None if no dose is due.
+    """
+    now = now or datetime.now(timezone.utc)
+    dose = mongo.db.doses.find_one_and_update(
+        {
+            "medication_id": str(medication_id),
+            "user_id": user_id,
+            "status": {"$in": ["upcoming", "missed"]},
+            "due_at": {"$lte": now + timedelta(minutes=DOSE_TAKE_WINDOW_MINUTES)},
+        },
+        {"$set": {"status": "taken", "taken_at": now}},
+        sort=[("due_at", DESCENDING)],
+        return_document=ReturnDocument.BEFORE,
+    )
+    if dose is None:
+        return None
+
+    record_transitions([(dose, dose["status"], "taken")])
+    return {**dose, "status": "taken", "taken_at": now}
+
+
+def delete_upcoming_doses(medication_ids):
+    """Deletes the upcoming doses of the given medications; taken/missed history is kept."""
+    upcoming = [dose["_id"] for dose in mongo.db.doses.find(
+        {"medication_id": {"$in": list(medication_ids)}, "status": "upcoming"}, {"_id": 1},
+    )]
+    if not upcoming:
+        return 0
+
+    # Claim them first (a dose taken meanwhile is not claimed), then delete the claimed ones
+    doses = _claim_doses({"_id": {"$in": upcoming}, "status": "upcoming"}, {"$set": {"status": "deleting"}})
+    record_transitions((dose, "upcoming", None) for dose in doses)
+    result = mongo.db.doses.delete_many({"_id": {"$in": [dose["_id"] for dose in doses]}})
+    return result.deleted_count
+
+
+def get_doses(user_id, start, end):
+    """Dose instances of a user with due times in [start, end), oldest first."""
+    return list(mongo.db.doses.find(
+        {"user_id": user_id, "due_at": {"$gte": start, "$lt": end}},
+    ).sort("due_at", ASCENDING))
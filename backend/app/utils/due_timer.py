@@ -0,0 +1,119 @@
+import heapq
+import itertools
+import threading
+import time
+from datetime import timezone
+
+
+# Medication statuses whose `next_due_at` is watched: "taken" means the last
+# dose was taken, and the medication turns "missed" if the next one is not
+TRACKED_STATUSES = ["upcoming", "taken"]
+
+
+class DueTimer:
+    """
+    In-process timer that calls `on_due(key, due_at)` once `due_at` plus a grace
+    period has passed. Entries live in a min-heap; rescheduling a key simply
+    pushes a new entry and stale ones are skipped when they reach the top,
+    so `schedule` and `cancel` are O(log n) / O(1).
+    """
+
+    def __init__(self, on_due=None, grace_seconds=0):
+        self.on_due = on_due
+        self.grace_seconds = grace_seconds
+        self._heap = []  # (fire_at epoch seconds, sequence, key, due_at)
+        self._current = {}  # key -> due_at of its live entry
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._running = False
+
+    @property
+    def running(self):
+        return self._running
+
+    def start(self):
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name="due-timer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+
+    def schedule(self, key, due_at):
+        """Fires `key` at `due_at` + grace, replacing any earlier entry for the same key."""
+        if due_at is None:
+            self.cancel(key)
+            return
+        if due_at.tzinfo is None:  # PyMongo returns naive UTC datetimes
+            due_at = due_at.replace(tzinfo=timezone.utc)
+
+        fire_at = due_at.timestamp() + self.grace_seconds
+        with self._condition:
+            if self._current.get(key) == due_at:
+                return  # Already scheduled, e.g. loaded again by the next poll
+            self._current[key] = due_at
+            heapq.heappush(self._heap, (fire_at, next(self._sequence), key, due_at))
+            # Wake the worker only if this entry is now the earliest
+            if self._heap[0][2] == key:
+                self._condition.notify()
+
+    def cancel(self, key):
+        with self._condition:
+            self._current.pop(key, None)
+
+    def __len__(self):
+        with self._condition:
+            return len(self._current)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                due = self._pop_due()
+                while self._running and due is None:
+                    timeout = self._heap[0][0] - time.time() if self._heap else None
+                    self._condition.wait(timeout)
+                    due = self._pop_due()
+                if not self._running:
+                    return
+
+            for key, due_at in due:
+                try:
+                    self.on_due(key, due_at)
+                except Exception as e:
+                    print(f"Due timer callback failed for {key}: {e}")
+
+    def _pop_due(self):
+        """Removes and returns every live entry whose fire time has passed (lock held)."""
+        now = time.time()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _, _, key, due_at = heapq.heappop(self._heap)
+            if self._current.get(key) == due_at:  # Skip entries replaced by a reschedule
+                del self._current[key]
+                due.append((key, due_at))
+        return due or None
+
+
+# Shared by the routes (which keep it in sync) and the status updater (which
+# sets the callback and starts it in "event" mode)
+due_timer = DueTimer()
+
+
+def schedule_medication_due(medication_id, next_due_at, status="upcoming"):
+    """
+    Updates this process's event-mode timer right after a medication is added
+    or its status changes. Timers in other processes pick the change up from
+    their due-time poll (see status_updater.run_due_time_poll).
+    """
+    if not due_timer.running:
+        return
+    if status in TRACKED_STATUSES and next_due_at is not None:
+        due_timer.schedule(("medication", str(medication_id)), next_due_at)
+    else:
+        due_timer.cancel(("medication", str(medication_id)))
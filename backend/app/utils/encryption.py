@@ -2,28 +2,118 @@ import os
 import base64
 import hmac
 import hashlib
+import json
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.hazmat.primitives import padding
 from cryptography.hazmat.backends import default_backend
 from bson.binary import Binary  
+from app.utils.cache import TTLCache
+from app.utils.metrics import timed_crypto
 
-# Generate random keys (DO NOT HARDCODE)
-KEY = base64.b64decode(os.getenv("ENCRYPTION_KEY"))
-HMAC_KEY = base64.b64decode(os.getenv("HMAC_KEY"))
+# Keys are read from the environment (DO NOT HARDCODE) on first use, or
+# explicitly through load_keys() from create_app
+_keys = None
 
-def encrypt_data(plain_text: str) -> str:
+# Whole-document (sealed) storage format
+# "field" keeps the legacy one-ciphertext-per-leaf layout for new writes,
+# "document" seals the whole sensitive subtree into a single AES-GCM blob.
+ENCRYPTION_FORMAT = os.getenv("ENCRYPTION_FORMAT", "document")
+SEALED_FIELD = "_sealed"  # Key holding the sealed blob inside a document
+DOCUMENT_FORMAT_VERSION = 2  # Version 1 is the legacy per-leaf format
+NONCE_SIZE = 12
+
+# Ciphertext storage encoding: "binary" stores raw bytes as BSON Binary with a
+# user-defined subtype (no base64 overhead), "base64" keeps the legacy text form
+CIPHERTEXT_ENCODING = os.getenv("CIPHERTEXT_ENCODING", "binary")
+RAW_CIPHERTEXT_SUBTYPE = 0x80  # Distinguishes raw ciphertext from legacy base64 Binary values
+
+PLAINTEXT_FIELDS = ("user_id", "_id", "status", "next_due_at", "timezone", "doses_generated_until")  # Never encrypted
+
+# Blind indexes: keyed hashes stored next to selected encrypted fields so
+# equality queries (medication search by name) can run in MongoDB without decrypting
+BLIND_INDEX_ENABLED = os.getenv("BLIND_INDEX_ENABLED", "true").lower() == "true"
+BLIND_INDEX_FIELDS = ("name_bidx", "time_bidx")  # Plaintext, never returned to clients (time_bidx: legacy)
+
+# Decrypted-value cache keyed by the ciphertext's MAC/GCM tag. Holds plaintext
+# in memory, so deployments that forbid that can turn it off
+DECRYPT_CACHE_ENABLED = os.getenv("DECRYPT_CACHE_ENABLED", "true").lower() == "true"
+decrypt_cache = TTLCache(
+    max_entries=int(os.getenv("DECRYPT_CACHE_MAX_ENTRIES", 10000)),
+    max_bytes=int(os.getenv("DECRYPT_CACHE_MAX_BYTES", 16 * 1024 * 1024)),
+    ttl=int(os.getenv("DECRYPT_CACHE_TTL", 300)),
+    sizeof=lambda entry: len(entry[0]) + len(entry[1]),  # (ciphertext, plaintext) bytes
+)
+
+
+class EncryptionKeys:
+    """AES/HMAC keys plus the subkeys derived from them."""
+
+    def __init__(self, key: bytes, hmac_key: bytes):
+        self.key = key
+        self.hmac_key = hmac_key
+        # Separate key for AES-GCM so the same key is never used in two cipher modes
+        self.aead_key = hmac.new(key, b"medbuddy-document-aead-v2", hashlib.sha256).digest()
+        self.blind_index_key = hmac.new(hmac_key, b"medbuddy-blind-index-v1", hashlib.sha256).digest()
+
+
+def load_keys(encryption_key=None, hmac_key=None) -> EncryptionKeys:
+    """
+    Loads the base64-encoded keys (from the arguments or the ENCRYPTION_KEY /
+    HMAC_KEY environment variables). Raises a clear error if either is missing.
+    """
+    global _keys
+    encryption_key = encryption_key or os.getenv("ENCRYPTION_KEY")
+    hmac_key = hmac_key or os.getenv("HMAC_KEY")
+    if not encryption_key or not hmac_key:
+        raise RuntimeError("ENCRYPTION_KEY and HMAC_KEY must be set to use encryption.")
+
+    _keys = EncryptionKeys(base64.b64decode(encryption_key), base64.b64decode(hmac_key))
+    decrypt_cache.clear()  # Never serve plaintext cached under other keys
+    return _keys
+
+
+def get_keys() -> EncryptionKeys:
+    """Returns the loaded keys, loading them from the environment on first use."""
+    return _keys or load_keys()
+
+def encode_ciphertext(raw: bytes):
+    """Wraps raw ciphertext bytes in the configured storage encoding."""
+    if CIPHERTEXT_ENCODING == "binary":
+        return Binary(raw, RAW_CIPHERTEXT_SUBTYPE)
+    return base64.b64encode(raw).decode()
+
+
+def decode_ciphertext(stored) -> bytes:
+    """
+    Returns raw ciphertext bytes from any stored form: raw Binary,
+    legacy Binary holding base64 text, or a base64 string.
+    """
+    if isinstance(stored, Binary) and stored.subtype == RAW_CIPHERTEXT_SUBTYPE:
+        return bytes(stored)
+    if isinstance(stored, Binary):  # Legacy Binary wrapping base64 text
+        stored = stored.decode('utf-8')
+    try:
+        return base64.b64decode(stored)
+    except Exception as e:
+        raise ValueError(f"Failed to decode base64: {e}")
+
+
+@timed_crypto("encrypt_data")
+def encrypt_data(plain_text: str):
     """
     Encrypts the given plain text using AES-256-CBC encryption with a random IV.
     Computes an HMAC to ensure integrity and prevent tampering.
-    Returns the base64-encoded (IV + encrypted data + HMAC).
+    Returns (IV + encrypted data + HMAC) in the configured storage encoding.
     """
+    keys = get_keys()
     iv = os.urandom(16)  # Generate a random IV
 
     # Convert plain text to bytes
     plain_text_bytes = plain_text.encode('utf-8')
 
     # Create AES cipher in CBC mode
-    cipher = Cipher(algorithms.AES(KEY), modes.CBC(iv), backend=default_backend())
+    cipher = Cipher(algorithms.AES(keys.key), modes.CBC(iv), backend=default_backend())
     encryptor = cipher.encryptor()
 
     # Apply PKCS7 padding
@@ -34,10 +124,10 @@ def encrypt_data(plain_text: str) -> str:
     encrypted_data = encryptor.update(padded_data) + encryptor.finalize()
 
     # Compute HMAC for integrity
-    mac = hmac.new(HMAC_KEY, iv + encrypted_data, hashlib.sha256).digest()
+    mac = hmac.new(keys.hmac_key, iv + encrypted_data, hashlib.sha256).digest()
 
-    # Return base64-encoded (IV + encrypted data + HMAC)
-    return base64.b64encode(iv + encrypted_data + mac).decode()
+    # Return (IV + encrypted data + HMAC) as raw Binary or base64 text
+    return encode_ciphertext(iv + encrypted_data + mac)
 
 
 def fix_base64_padding(base64_string: str) -> str:
@@ -50,19 +140,13 @@ def fix_base64_padding(base64_string: str) -> str:
     return base64_string
 
 
-def decrypt_data(encrypted_data: str) -> str:
+@timed_crypto("decrypt_data")
+def decrypt_data(encrypted_data) -> str:
     """
     Decrypts AES-256 encrypted data with HMAC verification.
-    Supports both binary and base64-encoded encrypted data.
+    Supports raw Binary, legacy Binary and base64-encoded encrypted data.
     """
-    if isinstance(encrypted_data, Binary):  # Handle MongoDB Binary format
-        encrypted_data = encrypted_data.decode('utf-8')
-
-    # Convert from Base64
-    try:
-        encrypted_data = base64.b64decode(encrypted_data)
-    except Exception as e:
-        raise ValueError(f"Failed to decode base64: {e}")
+    encrypted_data = decode_ciphertext(encrypted_data)
 
     # Validate data length (must contain IV + at least 16 bytes + HMAC)
     if len(encrypted_data) < 48:  # 16 bytes IV + encrypted data + 32 bytes HMAC
@@ -77,13 +161,19 @@ def decrypt_data(encrypted_data: str) -> str:
     # Extract actual encrypted data (excluding IV and HMAC)
     actual_encrypted_data = encrypted_data[16:-32]
 
+    # Only reuse a cached value for the exact same ciphertext, not just the same tag
+    cached = _cache_lookup(received_hmac, encrypted_data)
+    if cached is not None:
+        return cached.decode('utf-8')
+
     # Verify HMAC
-    computed_hmac = hmac.new(HMAC_KEY, iv + actual_encrypted_data, hashlib.sha256).digest()
+    keys = get_keys()
+    computed_hmac = hmac.new(keys.hmac_key, iv + actual_encrypted_data, hashlib.sha256).digest()
     if not hmac.compare_digest(computed_hmac, received_hmac):
         raise ValueError("HMAC verification failed! Possible tampering detected.")
 
     # Create AES cipher
-    cipher = Cipher(algorithms.AES(KEY), modes.CBC(iv), backend=default_backend())
+    cipher = Cipher(algorithms.AES(keys.key), modes.CBC(iv), backend=default_backend())
     decryptor = cipher.decryptor()
 
     try:
@@ -94,10 +184,33 @@ def decrypt_data(encrypted_data: str) -> str:
         unpadder = padding.PKCS7(algorithms.AES.block_size).unpadder()
         decrypted_data = unpadder.update(decrypted_padded) + unpadder.finalize()
 
-        return decrypted_data.decode('utf-8')
+        result = decrypted_data.decode('utf-8')
     except Exception as e:
         raise ValueError(f"Decryption failed: {e}")
 
+    _cache_store(received_hmac, encrypted_data, decrypted_data)
+    return result
+
+
+def _cache_lookup(tag: bytes, ciphertext: bytes):
+    """Returns the cached plaintext bytes for this ciphertext, or None."""
+    if not DECRYPT_CACHE_ENABLED:
+        return None
+    entry = decrypt_cache.get(tag)
+    if entry is not None and hmac.compare_digest(entry[0], ciphertext):
+        return entry[1]
+    return None
+
+
+def _cache_store(tag: bytes, ciphertext: bytes, plaintext: bytes):
+    if DECRYPT_CACHE_ENABLED:
+        decrypt_cache.set(tag, (ciphertext, plaintext))
+
+
+def decrypt_cache_stats() -> dict:
+    """Hit/miss/eviction counters of the decrypted-value cache."""
+    return {"enabled": DECRYPT_CACHE_ENABLED, **decrypt_cache.stats()}
+
 
 def encrypt_profile_data(profile):
     """
@@ -118,7 +231,9 @@ def encrypt_profile_data(profile):
 
 def decrypt_profile_data(profile):
     """Recursively decrypt all values, handling bytes and restoring original data types."""
-    if isinstance(profile, dict):
+    if isinstance(profile, dict) and SEALED_FIELD in profile:  # Whole-document format
+        return unseal_document(profile)
+    elif isinstance(profile, dict):
         return {key: decrypt_profile_data(value) for key, value in profile.items()}
     elif isinstance(profile, list):
         return [decrypt_profile_data(item) for item in profile]
@@ -152,3 +267,180 @@ def convert_to_original_type(value):
     except ValueError:
         return value  # Return as string if not a number
 
+
+def blind_index(purpose: str, value: str) -> str:
+    """
+    Computes a deterministic keyed hash of `value` for equality lookups.
+    `purpose` namespaces the hash so equal values in different fields never match.
+    """
+    message = f"{purpose}:{value}".encode('utf-8')
+    return hmac.new(get_keys().blind_index_key, message, hashlib.sha256).hexdigest()[:32]
+
+
+@timed_crypto("seal_document")
+def seal_document(data: dict, aead: AESGCM = None) -> dict:
+    """
+    Serializes the whole dictionary once and encrypts it with AES-256-GCM.
+    Returns a document holding a single versioned blob under SEALED_FIELD:
+    (version byte + nonce + ciphertext + GCM tag) in the configured storage encoding.
+    `aead` lets batch callers reuse one cipher instance.
+    """
+    header = bytes([DOCUMENT_FORMAT_VERSION])
+    nonce = os.urandom(NONCE_SIZE)
+    plain_bytes = json.dumps(data, separators=(",", ":")).encode('utf-8')
+
+    # The version byte is authenticated so it cannot be swapped
+    sealed = (aead or AESGCM(get_keys().aead_key)).encrypt(nonce, plain_bytes, header)
+
+    return {SEALED_FIELD: encode_ciphertext(header + nonce + sealed)}
+
+
+@timed_crypto("unseal_document")
+def unseal_document(document: dict) -> dict:
+    """
+    Decrypts a sealed document and merges the plaintext fields back with
+    any fields stored next to the blob (e.g. user_id, status, _id).
+    """
+    blob = decode_ciphertext(document[SEALED_FIELD])
+
+    # Version byte + nonce + at least the 16 byte GCM tag
+    if len(blob) < 1 + NONCE_SIZE + 16:
+        raise ValueError("Sealed document is too short or corrupted.")
+
+    version = blob[0]
+    if version != DOCUMENT_FORMAT_VERSION:
+        raise ValueError(f"Unsupported sealed document version: {version}")
+
+    nonce = blob[1:1 + NONCE_SIZE]
+    plain_bytes = _cache_lookup(blob[-16:], blob)  # GCM tag is the last 16 bytes
+    if plain_bytes is None:
+        try:
+            plain_bytes = AESGCM(get_keys().aead_key).decrypt(nonce, blob[1 + NONCE_SIZE:], blob[:1])
+        except Exception:
+            raise ValueError("Sealed document authentication failed! Possible tampering detected.")
+        _cache_store(blob[-16:], blob, plain_bytes)
+
+    plain_fields = {k: v for k, v in document.items() if k != SEALED_FIELD and k not in BLIND_INDEX_FIELDS}
+    return {**plain_fields, **json.loads(plain_bytes)}
+
+
+def is_sealed(document) -> bool:
+    """Returns True if the document is stored in the whole-document format."""
+    return isinstance(document, dict) and SEALED_FIELD in document
+
+
+def encrypt_document(data: dict) -> dict:
+    """
+    Encrypts a dictionary using the configured storage format.
+    New writes go through here so the format can be switched with ENCRYPTION_FORMAT.
+    """
+    if ENCRYPTION_FORMAT == "document":
+        return seal_document(data)
+    return encrypt_profile_data(data)
+
+
+def encrypt_documents(documents) -> list:
+    """
+    Encrypts a batch of dictionaries with the configured storage format,
+    returned in the same order. The AES-GCM key is set up once for the batch.
+    """
+    if ENCRYPTION_FORMAT == "document":
+        aead = AESGCM(get_keys().aead_key)
+        return [seal_document(data, aead) for data in documents]
+    return [encrypt_profile_data(data) for data in documents]
+
+
+def decrypt_document_fields(document: dict, fields) -> dict:
+    """
+    Decrypts only the requested fields of a document, whichever format it is stored in.
+    Sealed documents are opened once; legacy documents decrypt just the listed leaves.
+    """
+    if is_sealed(document):
+        opened = unseal_document(document)
+        return {field: opened.get(field) for field in fields}
+    return {field: decrypt_profile_data(document.get(field)) for field in fields}
+
+
+def upgrade_document_update(document: dict, plaintext_fields=PLAINTEXT_FIELDS):
+    """
+    Builds the update needed to move a legacy per-field document to the sealed format.
+    Used on write paths so documents are upgraded lazily as they are touched.
+    Returns None if nothing needs to change.
+    """
+    if ENCRYPTION_FORMAT != "document" or is_sealed(document):
+        return None
+
+    excluded = set(plaintext_fields) | {"_id"} | set(BLIND_INDEX_FIELDS)
+    legacy_fields = {k: v for k, v in document.items() if k not in excluded}
+    if not legacy_fields:
+        return None
+
+    decrypted = decrypt_profile_data(legacy_fields)
+    return {
+        "$set": seal_document(decrypted),
+        "$unset": {field: "" for field in legacy_fields},
+    }
+
+
+def _decrypt_one(document: dict, fields, plaintext_fields) -> dict:
+    """Decrypts a single document, keeping its plaintext fields as they are."""
+    kept = {key: document[key] for key in plaintext_fields if key in document}
+    if fields is None:
+        encrypted = {
+            k: v for k, v in document.items()
+            if k not in plaintext_fields and k not in BLIND_INDEX_FIELDS
+        }
+        decrypted = decrypt_profile_data(encrypted)
+    else:
+        decrypted = decrypt_document_fields(document, fields)
+    return {**kept, **decrypted}
+
+
+def decrypt_documents(documents, fields=None, plaintext_fields=PLAINTEXT_FIELDS) -> list:
+    """
+    Decrypts a batch of documents and returns them in the same order.
+    If `fields` is given only those fields are decrypted and returned,
+    otherwise every field not in `plaintext_fields` is decrypted.
+    """
+    return [_decrypt_one(document, fields, plaintext_fields) for document in documents]
+
+
+def _is_legacy_ciphertext(value) -> bool:
+    """True if `value` is base64 text (or legacy Binary) holding an authentic per-field ciphertext."""
+    if isinstance(value, Binary) and value.subtype == RAW_CIPHERTEXT_SUBTYPE:
+        return False
+    if not isinstance(value, (str, bytes)):
+        return False
+    try:
+        raw = decode_ciphertext(value)
+    except ValueError:
+        return False
+    if len(raw) < 48:
+        return False
+    computed_hmac = hmac.new(get_keys().hmac_key, raw[:-32], hashlib.sha256).digest()
+    return hmac.compare_digest(computed_hmac, raw[-32:])
+
+
+def to_raw_ciphertext(value):
+    """
+    Recursively rewrites base64 ciphertexts as raw Binary without decrypting them.
+    Values that are not authentic ciphertexts are returned unchanged.
+    Returns (new_value, changed).
+    """
+    if isinstance(value, dict):
+        changed = False
+        converted = {}
+        for key, item in value.items():
+            if key == SEALED_FIELD and not (isinstance(item, Binary) and item.subtype == RAW_CIPHERTEXT_SUBTYPE):
+                converted[key] = Binary(decode_ciphertext(item), RAW_CIPHERTEXT_SUBTYPE)
+                changed = True
+            else:
+                converted[key], item_changed = to_raw_ciphertext(item)
+                changed = changed or item_changed
+        return converted, changed
+    if isinstance(value, list):
+        results = [to_raw_ciphertext(item) for item in value]
+        return [item for item, _ in results], any(changed for _, changed in results)
+    if _is_legacy_ciphertext(value):
+        return Binary(decode_ciphertext(value), RAW_CIPHERTEXT_SUBTYPE), True
+    return value, False
@@ -1,10 +1,23 @@
+import os
 import firebase_admin
-from firebase_admin import credentials, messaging
+from firebase_admin import credentials, messaging, exceptions
+
+# Service account file, resolved next to this module unless given as an absolute path
+FIREBASE_CREDENTIALS = os.getenv(
+    "FIREBASE_CREDENTIALS", "pushnotificationsinvictus-firebase-adminsdk-fbsvc-0970a4e463.json"
+)
+
+
+def init_firebase():
+    """
+    Initializes the Firebase Admin SDK on first use (or explicitly from create_app).
+    Safe to call repeatedly.
+    """
+    if not firebase_admin._apps:
+        cred_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), FIREBASE_CREDENTIALS)
+        cred = credentials.Certificate(cred_path)
+        firebase_admin.initialize_app(cred)
 
-# Initialize Firebase Admin SDK only if not already initialized
-if not firebase_admin._apps:
-    cred = credentials.Certificate("../backend/app/utils/pushnotificationsinvictus-firebase-adminsdk-fbsvc-0970a4e463.json")
-    firebase_admin.initialize_app(cred)
 
 def send_push_notification(fcm_token, title, body):
     """
@@ -16,6 +29,7 @@ def send_push_notification(fcm_token, title, body):
     
     
     try:
+        init_firebase()
         print(f"Sending notification to token: {fcm_token}")
         message = messaging.Message(
             notification=messaging.Notification(
@@ -30,3 +44,63 @@ def send_push_notification(fcm_token, title, body):
     except Exception as e:
         print(f"Failed to send notification to {fcm_token}: {e}")
         return 0  # No messages sent
+
+
+# FCM errors worth retrying later, and errors meaning the token is gone for good
+TRANSIENT_ERRORS = (
+    exceptions.UnavailableError,
+    exceptions.InternalError,
+    exceptions.DeadlineExceededError,
+    messaging.QuotaExceededError,
+)
+DEAD_TOKEN_ERRORS = (messaging.UnregisteredError, messaging.SenderIdMismatchError)
+
+FCM_MAX_BATCH = 500  # Limit of one send_each call
+
+
+class FirebaseTransport:
+    """
+    Sends push notifications through FCM in batches.
+    `send_batch` takes dicts with token/title/body and returns one
+    (outcome, detail) pair per message, where outcome is "sent", "retry",
+    "dead_token" or "failed".
+    """
+
+    def send_batch(self, messages):
+        try:
+            init_firebase()
+        except Exception as e:
+            # Bad credentials or config: retry later, until the entries run out of attempts
+            print(f"Firebase initialization failed: {e}")
+            return [("retry", str(e)) for _ in messages]
+
+        results = []
+        for start in range(0, len(messages), FCM_MAX_BATCH):
+            chunk = messages[start:start + FCM_MAX_BATCH]
+            fcm_messages = [
+                messaging.Message(
+                    notification=messaging.Notification(title=m["title"], body=m["body"]),
+                    token=m["token"],
+                )
+                for m in chunk
+            ]
+            try:
+                response = messaging.send_each(fcm_messages)
+            except Exception as e:
+                # Only this chunk failed; chunks already sent keep their results.
+                # Non-transient errors are retried too and fail after OUTBOX_MAX_ATTEMPTS.
+                if not isinstance(e, TRANSIENT_ERRORS):
+                    print(f"FCM batch send failed: {e}")
+                results.extend(("retry", str(e)) for _ in chunk)
+                continue
+
+            for item in response.responses:
+                if item.success:
+                    results.append(("sent", item.message_id))
+                elif isinstance(item.exception, DEAD_TOKEN_ERRORS):
+                    results.append(("dead_token", str(item.exception)))
+                elif isinstance(item.exception, TRANSIENT_ERRORS):
+                    results.append(("retry", str(item.exception)))
+                else:
+                    results.append(("failed", str(item.exception)))
+        return results
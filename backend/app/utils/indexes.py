@@ -0,0 +1,204 @@
+from datetime import datetime, timezone
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from app.database import mongo
+from app.utils.notification_outbox import OUTBOX_RETENTION_DAYS
+from app.config import Config
+from app.utils.caregivers import dashboard_pipeline
+
+# Every index the app relies on, per collection. Applied idempotently by
+# ensure_indexes() at startup (CREATE_INDEXES_ON_STARTUP) or `flask ensure-indexes`
+INDEXES = {
+    "users": [
+        # Login / register look users up by plaintext email
+        IndexModel([("email", ASCENDING)], unique=True),
+        # Caregiver(s) assigned to a set of patients
+        IndexModel([("profile.patients_assigned", ASCENDING)]),
+        # Dead-token cleanup in the outbox dispatcher
+        IndexModel([("profile.fcm_token", ASCENDING)], sparse=True),
+    ],
+    "medications": [
+        # /get pagination and the per-status summary
+        IndexModel([("user_id", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("user_id", ASCENDING), ("status", ASCENDING)]),
+        # Missed-dose sweep and due timer: indexed range on the UTC due time
+        IndexModel([("status", ASCENDING), ("next_due_at", ASCENDING)]),
+        # Dose horizon top-up
+        IndexModel([("doses_generated_until", ASCENDING)]),
+        # Blind index lookups
+        IndexModel([("user_id", ASCENDING), ("name_bidx", ASCENDING)]),
+    ],
+    "doses": [
+        # Idempotent dose generation
+        IndexModel([("medication_id", ASCENDING), ("due_at", ASCENDING)], unique=True),
+        # Calendar ranges
+        IndexModel([("user_id", ASCENDING), ("due_at", ASCENDING)]),
+        # Missed-dose sweep
+        IndexModel([("status", ASCENDING), ("due_at", ASCENDING)]),
+    ],
+    "adherence": [
+        # One rollup per patient, local day and medication; date range reads
+        IndexModel([("user_id", ASCENDING), ("day", ASCENDING), ("medication_id", ASCENDING)], unique=True),
+    ],
+    "notification_outbox": [
+        IndexModel([("status", ASCENDING), ("next_attempt_at", ASCENDING)]),
+        IndexModel([("completed_at", ASCENDING)], expireAfterSeconds=OUTBOX_RETENTION_DAYS * 86400),
+        # One open digest per group; concurrent upserts then merge instead of duplicating
+        IndexModel(
+            [("group_key", ASCENDING)],
+            unique=True,
+            partialFilterExpression={"group_key": {"$exists": True}, "status": "pending", "attempts": 0},
+        ),
+        # Per-device rate limit
+        IndexModel([("token", ASCENDING), ("status", ASCENDING), ("completed_at", ASCENDING)]),
+    ],
+    "notifications": [
+        # Keyset pagination and unread counts, for caregivers and patients
+        IndexModel([("caregiver_id", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("caregiver_id", ASCENDING), ("read_at", ASCENDING)]),
+        IndexModel([("patient_id", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("patient_id", ASCENDING), ("read_at", ASCENDING)]),
+    ] + ([
+        # Retention (opt-in)
+        IndexModel([("timestamp", ASCENDING)], expireAfterSeconds=Config.NOTIFICATION_RETENTION_DAYS * 86400),
+    ] if Config.NOTIFICATION_RETENTION_DAYS > 0 else []),
+}
+
+
+def find_duplicates(collection, keys, limit=5):
+    """Up to `limit` key values held by more than one document, which block a unique index on `keys`."""
+    return [row["_id"] for row in mongo.db[collection].aggregate([
+        {"$group": {"_id": {key: f"${key}" for key in keys}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+        {"$limit": limit},
+    ], allowDiskUse=True)]
+
+
+def ensure_indexes(collections=None):
+    """
+    Creates the declared indexes of `collections` (default: all). Safe to repeat.
+    Each index is created on its own, so one that fails (e.g. a unique index
+    over existing duplicates) is reported and the others are still created.
+    Returns ({collection: [index names created]}, [(collection, index name) failed]).
+    """
+    created, failed = {}, []
+    for collection in collections or INDEXES:
+        created[collection] = []
+        for index in INDEXES[collection]:
+            try:
+                created[collection] += mongo.db[collection].create_indexes([index])
+            except Exception as e:
+                name = index.document["name"]
+                failed.append((collection, name))
+                print(f"Could not create index {name} on {collection}: {e}")
+                if index.document.get("unique") and "partialFilterExpression" not in index.document:
+                    duplicates = find_duplicates(collection, list(index.document["key"]))
+                    if duplicates:
+                        print(f"Remove the duplicates first, e.g.: {duplicates}")
+    return created, failed
+
+
+def query_shapes():
+    """
+    The query shapes the routes and the scheduler issue, with sample values.
+    Each is (name, collection, filter, sort) for a find, or
+    (name, collection, pipeline, None) for an aggregation.
+    Keep this in step with new queries so `flask check-indexes` covers them.
+    """
+    now = datetime.now(timezone.utc)
+    user_id = str(ObjectId())
+    ids = [ObjectId()]
+    return [
+        # Auth / profile
+        ("login", "users", {"email": "user@example.com"}, None),
+        ("user by id", "users", {"_id": ObjectId()}, None),
+        ("patients by id", "users", {"_id": {"$in": ids}, "role": "patient"}, None),
+        ("caregivers of patients", "users", {"profile.patients_assigned": {"$in": [user_id]}}, None),
+        ("caregiver dashboard", "users", dashboard_pipeline(str(ObjectId())), None),
+        ("dead token cleanup", "users", {"profile.fcm_token": {"$in": ["token"]}}, None),
+        # Medication routes
+        ("medication page", "medications", {"user_id": user_id, "_id": {"$gt": ids[0]}}, [("_id", ASCENDING)]),
+        ("medication by id", "medications", {"_id": ids[0], "user_id": user_id}, None),
+        ("medication summary", "medications", [
+            {"$match": {"user_id": user_id, "status": {"$in": ["taken", "missed", "upcoming"]}}},
+            {"$group": {"_id": "$status", "count": {"$sum": 1}}},
+        ], None),
+        ("medications by name", "medications", {"user_id": user_id, "name_bidx": "bidx"}, None),
+        ("doses in range", "doses", {"user_id": user_id, "due_at": {"$gte": now, "$lt": now}}, [("due_at", ASCENDING)]),
+        ("dose to take", "doses", {
+            "medication_id": user_id, "user_id": user_id,
+            "status": {"$in": ["upcoming", "missed"]}, "due_at": {"$lte": now},
+        }, [("due_at", DESCENDING)]),
+        ("adherence range", "adherence", {"user_id": user_id, "day": {"$gte": "2024-01-01", "$lte": "2024-01-07"}},
+         [("day", ASCENDING)]),
+        ("overdue doses by id", "doses", {"_id": {"$in": ids}, "status": "upcoming"}, None),
+        ("upcoming doses of medications", "doses", {"medication_id": {"$in": [user_id]}, "status": "upcoming"}, None),
+        # Notification routes
+        ("notification page", "notifications", {"caregiver_id": user_id, "timestamp": {"$lt": now}},
+         [("timestamp", DESCENDING), ("_id", DESCENDING)]),
+        ("unread count", "notifications", {"patient_id": user_id, "read_at": None}, None),
+        # Status updater
+        ("overdue medications", "medications", {"status": {"$in": ["upcoming", "taken"]}, "next_due_at": {"$lte": now}}, None),
+        ("medications without due time", "medications", {"status": "upcoming", "next_due_at": {"$exists": False}}, None),
+        ("overdue doses", "doses", {"status": "upcoming", "due_at": {"$lte": now}}, None),
+        ("dose horizon", "medications", {"$or": [
+            {"doses_generated_until": {"$lt": now}},
+            {"doses_generated_until": {"$exists": False}},
+        ]}, None),
+        ("medications by id", "medications", {"_id": {"$in": ids}}, None),
+        # Outbox dispatcher
+        ("stale outbox claims", "notification_outbox", {"status": "sending", "claimed_at": {"$lte": now}}, None),
+        ("due outbox entries", "notification_outbox",
+         {"status": {"$in": ["pending", "deferred"]}, "next_attempt_at": {"$lte": now}},
+         [("next_attempt_at", ASCENDING)]),
+        ("open digest", "notification_outbox", {"group_key": "missed:a:b", "status": "pending", "attempts": 0}, None),
+        ("device send counts", "notification_outbox", [
+            {"$match": {"token": {"$in": ["token"]}, "status": "sent", "completed_at": {"$gte": now}}},
+            {"$group": {"_id": "$token", "count": {"$sum": 1}}},
+        ], None),
+        ("lease", "locks", {"_id": "missed-medication-sweep", "expires_at": {"$gt": now}}, None),
+    ]
+
+
+def _winning_stages(plan):
+    """Yields every stage name in the winning plan(s) of an explain() result."""
+    if isinstance(plan, dict):
+        for key, value in plan.items():
+            if key == "winningPlan":
+                yield from _plan_stages(value)
+            else:
+                yield from _winning_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _winning_stages(item)
+
+
+def _plan_stages(plan):
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _plan_stages(item)
+
+
+def find_collection_scans():
+    """
+    Runs explain() for every query shape and returns the (name, collection)
+    pairs whose winning plan contains a COLLSCAN.
+    """
+    scans = []
+    for name, collection, query, sort in query_shapes():
+        if isinstance(query, list):
+            plan = mongo.db.command("explain", {"aggregate": collection, "pipeline": query, "cursor": {}})
+        else:
+            cursor = mongo.db[collection].find(query)
+            if sort:
+                cursor = cursor.sort(sort)
+            plan = cursor.explain()
+
+        if "COLLSCAN" in _winning_stages(plan):
+            scans.append((name, collection))
+    return scans
@@ -4,6 +4,17 @@ from flask import request, jsonify, current_app
 from datetime import datetime, timedelta
 from flask import current_app
 
+def decode_jwt(authorization, secret_key):
+    """
+    Decodes a "Bearer <token>" Authorization header. Shared by the WSGI and ASGI apps.
+    Raises jwt.ExpiredSignatureError / jwt.InvalidTokenError.
+    """
+    parts = authorization.split("Bearer ")
+    if len(parts) != 2:
+        raise jwt.InvalidTokenError("Malformed Authorization header")
+    return jwt.decode(parts[1], secret_key, algorithms=["HS256"])  # Remove "Bearer " prefix
+
+
 def jwt_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
@@ -13,8 +24,7 @@ def jwt_required(f):
             return jsonify({"error": "Token is missing"}), 401
         
         try:
-            token = token.split("Bearer ")[1]  # Remove "Bearer " prefix
-            decoded_token = jwt.decode(token, current_app.config["SECRET_KEY"], algorithms=["HS256"])
+            decoded_token = decode_jwt(token, current_app.config["SECRET_KEY"])
             request.user_id = decoded_token["user_id"]
             request.role = decoded_token["role"]
         except jwt.ExpiredSignatureError:
@@ -28,7 +38,7 @@ def jwt_required(f):
 
 
 
-def generate_jwt(user_id, role):
+def generate_jwt(user_id, role, secret_key=None):
     """
     Generate a JWT token for authentication.
     """
@@ -37,4 +47,4 @@ def generate_jwt(user_id, role):
         "role": role,
         "exp": datetime.utcnow() + timedelta(hours=2)  # Token expires in 2 hours
     }
-    return jwt.encode(payload, current_app.config["SECRET_KEY"], algorithm="HS256")
+    return jwt.encode(payload, secret_key or current_app.config["SECRET_KEY"], algorithm="HS256")
@@ -0,0 +1,98 @@
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from app.database import mongo
+
+# Identifies this process in the `locks` collection
+PROCESS_OWNER = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def acquire_lease(name, ttl_seconds, owner=PROCESS_OWNER):
+    """
+    Acquires or renews the MongoDB-backed lease `name` for `ttl_seconds`.
+    Returns the lease's fencing token if this process holds it, otherwise None.
+    The token only increases when ownership changes; pass it to `fence_write`
+    so writes from a process that lost the lease are rejected by MongoDB.
+    """
+    now = datetime.now(timezone.utc)
+    expires_at = now + timedelta(seconds=ttl_seconds)
+
+    # Renew a lease we already hold
+    lease = mongo.db.locks.find_one_and_update(
+        {"_id": name, "owner": owner, "expires_at": {"$gt": now}},
+        {"$set": {"expires_at": expires_at, "renewed_at": now}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if lease:
+        return lease["token"]
+
+    # Take over a free or expired lease (creating it on first use)
+    try:
+        lease = mongo.db.locks.find_one_and_update(
+            {"_id": name, "$or": [{"expires_at": {"$lte": now}}, {"owner": None}]},
+            {
+                "$set": {
+                    "owner": owner,
+                    "host": socket.gethostname(),
+                    "pid": os.getpid(),
+                    "acquired_at": now,
+                    "renewed_at": now,
+                    "expires_at": expires_at,
+                },
+                "$inc": {"token": 1},
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+    except DuplicateKeyError:
+        return None  # Another process holds a live lease
+
+    print(f"Lease '{name}' acquired by {owner} (token {lease['token']})")
+    return lease["token"]
+
+
+def fence_write(query, update, token, field):
+    """
+    Makes a write conditional on the fencing `token`: it only matches documents
+    last stamped with this token or an older one, and stamps `token` on them.
+    A process paused past its lease expiry then cannot overwrite documents the
+    new holder (with a higher token) has already written.
+    """
+    query = {**query, field: {"$not": {"$gt": token}}}  # Also matches documents never stamped
+    update = {**update, "$set": {**update.get("$set", {}), field: token}}
+    return query, update
+
+
+def holds_lease(name, token, owner=PROCESS_OWNER):
+    """
+    True if this process still holds lease `name` with fencing token `token`.
+    A cheap early exit only; the fence itself is in the writes (`fence_write`).
+    """
+    now = datetime.now(timezone.utc)
+    return mongo.db.locks.count_documents(
+        {"_id": name, "owner": owner, "token": token, "expires_at": {"$gt": now}}, limit=1
+    ) > 0
+
+
+def lease_owner(name):
+    """The owner of lease `name` if it is currently held, otherwise None."""
+    now = datetime.now(timezone.utc)
+    lease = mongo.db.locks.find_one({"_id": name, "owner": {"$ne": None}, "expires_at": {"$gt": now}}, {"owner": 1})
+    return lease["owner"] if lease else None
+
+
+def release_lease(name, owner=PROCESS_OWNER):
+    """Gives up lease `name` early so another process can take over without waiting for expiry."""
+    mongo.db.locks.update_one(
+        {"_id": name, "owner": owner},
+        {"$set": {"owner": None, "expires_at": datetime.now(timezone.utc)}},
+    )
+
+
+def get_lease_states():
+    """Current state of every lease, for operators."""
+    return list(mongo.db.locks.find({}, {"_id": 1, "owner": 1, "host": 1, "pid": 1, "token": 1,
+                                         "acquired_at": 1, "renewed_at": 1, "expires_at": 1}))
@@ -0,0 +1,43 @@
+from app.database import mongo
+from app.utils.encryption import decrypt_documents, SEALED_FIELD
+
+MEDICATION_STATUSES = ("taken", "missed", "upcoming")
+
+
+def medication_summary(user_id, statuses=None, fields=("name", "time")):
+    """
+    Groups a user's medications by status in a single aggregation, fetching only
+    the projected encrypted `fields`, and decrypts every group in one batch.
+    Returns {status: {"count": n, "medications": [{"_id", <fields>...}]}} for
+    each requested status (all statuses by default).
+    """
+    statuses = list(statuses or MEDICATION_STATUSES)
+    groups = mongo.db.medications.aggregate(summary_pipeline(user_id, statuses, fields))
+    return assemble_summary(groups, statuses, fields)
+
+
+def summary_pipeline(user_id, statuses, fields):
+    """The aggregation behind medication_summary (shared with the async app)."""
+    match = {"user_id": user_id, "status": {"$in": list(statuses)}}
+    projection = {"status": 1, SEALED_FIELD: 1, **{field: 1 for field in fields}}
+    return [
+        {"$match": match},
+        {"$project": projection},
+        {"$group": {"_id": "$status", "count": {"$sum": 1}, "medications": {"$push": "$$ROOT"}}},
+    ]
+
+
+def assemble_summary(groups, statuses, fields):
+    """Decrypts the aggregated groups in one batch and arranges them by status."""
+    summary = {status: {"count": 0, "medications": []} for status in statuses}
+    encrypted = []
+    for group in groups:
+        summary[group["_id"]]["count"] = group["count"]
+        encrypted.extend(group["medications"])
+
+    # One batch decrypt for every group
+    for med in decrypt_documents(encrypted, fields=list(fields)):
+        summary[med["status"]]["medications"].append(
+            {"_id": str(med["_id"]), **{field: med[field] for field in fields}}
+        )
+    return summary
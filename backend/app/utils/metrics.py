@@ -0,0 +1,267 @@
+import contextvars
+import threading
+import time
+from functools import wraps
+from pymongo import monitoring
+
+# Latency buckets in seconds (Prometheus client defaults)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+
+_registry = []
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(label, "")) for label in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels."""
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}  # label values -> [bucket counts, sum, count]
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(label, "")) for label in self.labelnames)
+        with self._lock:
+            counts, total, count = self._values.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value, count + 1)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                for bound, bucket_count in zip(self.buckets, counts):
+                    labels = _format_labels(self.labelnames + ("le",), key + (str(bound),))
+                    lines.append(f"{self.name}_bucket{labels} {bucket_count}")
+                labels = _format_labels(self.labelnames + ("le",), key + ("+Inf",))
+                lines.append(f"{self.name}_bucket{labels} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+
+def render_metrics():
+    """All registered metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# Application metrics
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status"),
+)
+mongo_command_duration = Histogram(
+    "mongo_command_duration_seconds", "MongoDB command latency by command", ("command",),
+)
+request_mongo_duration = Histogram(
+    "http_request_mongo_seconds", "MongoDB time spent per HTTP request by route", ("method", "route"),
+)
+request_mongo_commands = Histogram(
+    "http_request_mongo_commands", "MongoDB commands issued per HTTP request by route", ("method", "route"),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+mongo_command_failures = Counter("mongo_command_failures_total", "Failed MongoDB commands", ("command",))
+crypto_duration = Histogram(
+    "crypto_duration_seconds", "Time spent encrypting / decrypting", ("operation",),
+    buckets=(0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1),
+)
+job_duration = Histogram("scheduler_job_duration_seconds", "Scheduler job run time", ("job",))
+job_runs = Counter("scheduler_job_runs_total", "Scheduler job runs by outcome", ("job", "outcome"))
+job_documents = Counter("scheduler_job_documents_total", "Documents touched by scheduler jobs", ("job",))
+password_rejections = Counter(
+    "password_pool_rejections_total", "Password hash / verify calls refused by a full pool", ("operation",),
+)
+
+
+class RequestStats:
+    """Per-request breakdown of where the time went."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.mongo_seconds = 0.0
+        self.mongo_commands = 0
+        self.crypto = {}  # operation -> [calls, seconds]
+        self._lock = threading.Lock()  # Decryption pool threads report into the same request
+
+    def add_mongo(self, seconds):
+        with self._lock:
+            self.mongo_seconds += seconds
+            self.mongo_commands += 1
+
+    def add_crypto(self, operation, seconds):
+        with self._lock:
+            calls, total = self.crypto.get(operation, (0, 0.0))
+            self.crypto[operation] = (calls + 1, total + seconds)
+
+    def summary(self):
+        crypto = ", ".join(
+            f"{operation}={calls}x/{total * 1000:.1f}ms" for operation, (calls, total) in sorted(self.crypto.items())
+        )
+        return f"mongo={self.mongo_commands} cmds/{self.mongo_seconds * 1000:.1f}ms crypto=[{crypto}]"
+
+
+_request_stats = contextvars.ContextVar("request_stats", default=None)
+
+
+def current_request_stats():
+    return _request_stats.get()
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Records every MongoDB command's latency globally and against the current request."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record(event)
+
+    def failed(self, event):
+        mongo_command_failures.inc(command=event.command_name)
+        self._record(event)
+
+    def _record(self, event):
+        seconds = event.duration_micros / 1_000_000
+        mongo_command_duration.observe(seconds, command=event.command_name)
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.add_mongo(seconds)
+
+
+_listener_registered = False
+
+
+def register_mongo_listener():
+    """Registers the command listener; must run before the MongoClient is created."""
+    global _listener_registered
+    if not _listener_registered:
+        monitoring.register(MongoCommandMetrics())
+        _listener_registered = True
+
+
+def timed_crypto(operation):
+    """Decorator recording how long an encryption primitive takes."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                seconds = time.perf_counter() - start
+                crypto_duration.observe(seconds, operation=operation)
+                stats = _request_stats.get()
+                if stats is not None:
+                    stats.add_crypto(operation, seconds)
+        return wrapper
+    return decorator
+
+
+def track_job(name):
+    """
+    Decorator recording a scheduler job's duration and outcome. A job returns
+    the number of documents it touched, or None if it skipped the run (e.g.
+    another worker holds its lease).
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                touched = func(*args, **kwargs)
+            except Exception:
+                job_runs.inc(job=name, outcome="error")
+                raise
+            finally:
+                job_duration.observe(time.perf_counter() - start, job=name)
+            job_runs.inc(job=name, outcome="skipped" if touched is None else "ok")
+            job_documents.inc(touched or 0, job=name)
+            return touched
+        return wrapper
+    return decorator
+
+
+def init_metrics(app):
+    """
+    Times every request by route, attaches the Mongo / crypto breakdown, serves
+    GET /metrics (behind METRICS_TOKEN when set) and, when SLOW_REQUEST_MS is
+    set, logs slower requests.
+    """
+    import hmac
+    from flask import Response, request
+
+    slow_request_seconds = app.config.get("SLOW_REQUEST_MS", 0) / 1000
+    metrics_token = app.config.get("METRICS_TOKEN")
+
+    @app.before_request
+    def start_request_stats():
+        request.metrics_token = _request_stats.set(RequestStats())
+
+    @app.after_request
+    def record_request_stats(response):
+        stats = _request_stats.get()
+        if stats is None:
+            return response
+        seconds = time.perf_counter() - stats.started
+        # Route template, not the raw path, so IDs do not explode the label set
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        http_request_duration.observe(seconds, method=request.method, route=route, status=response.status_code)
+        request_mongo_duration.observe(stats.mongo_seconds, method=request.method, route=route)
+        request_mongo_commands.observe(stats.mongo_commands, method=request.method, route=route)
+
+        if slow_request_seconds and seconds >= slow_request_seconds:
+            print(f"Slow request: {request.method} {route} {response.status_code} "
+                  f"{seconds * 1000:.1f}ms {stats.summary()}")
+        return response
+
+    @app.teardown_request
+    def clear_request_stats(exc=None):
+        token = getattr(request, "metrics_token", None)
+        if token is not None:
+            _request_stats.reset(token)
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics():
+        if metrics_token and not hmac.compare_digest(
+            request.headers.get("Authorization", ""), f"Bearer {metrics_token}"
+        ):
+            return Response("Unauthorized\n", status=401, mimetype="text/plain")
+        return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
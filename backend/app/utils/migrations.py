@@ -0,0 +1,129 @@
+from pymongo import ASCENDING, UpdateMany, UpdateOne
+from app.database import mongo
+from app.utils.encryption import to_raw_ciphertext, PLAINTEXT_FIELDS, BLIND_INDEX_FIELDS
+
+MIGRATION_BATCH_SIZE = 500
+
+
+def _get_checkpoint(name):
+    """Last _id processed by a migration, so an interrupted run can resume."""
+    state = mongo.db.migrations.find_one({"_id": name})
+    return state.get("last_id") if state else None
+
+
+def _save_checkpoint(name, last_id, processed, done=False):
+    mongo.db.migrations.update_one(
+        {"_id": name},
+        {"$set": {"last_id": last_id, "done": done}, "$inc": {"processed": processed}},
+        upsert=True,
+    )
+
+
+def _migrate_collection(name, collection, query, convert, batch_size, restart):
+    """
+    Walks `collection` in _id order, converting each document with `convert`
+    (which returns a `$set` dict or None) and writing changes with one bulk write per batch.
+    """
+    last_id = None if restart else _get_checkpoint(name)
+    rewritten = 0
+
+    while True:
+        batch_query = dict(query)
+        if last_id is not None:
+            batch_query["_id"] = {"$gt": last_id}
+        batch = list(collection.find(batch_query).sort("_id", ASCENDING).limit(batch_size))
+        if not batch:
+            break
+
+        operations = []
+        for document in batch:
+            changes = convert(document)
+            if changes:
+                operations.append(UpdateOne({"_id": document["_id"]}, {"$set": changes}))
+
+        if operations:
+            collection.bulk_write(operations, ordered=False)
+            rewritten += len(operations)
+
+        last_id = batch[-1]["_id"]
+        _save_checkpoint(name, last_id, len(batch))
+        print(f"[{name}] rewrote {rewritten} documents so far")
+
+    _save_checkpoint(name, last_id, 0, done=True)
+    return rewritten
+
+
+def _convert_medication(document):
+    skip = set(PLAINTEXT_FIELDS) | set(BLIND_INDEX_FIELDS)
+    encrypted = {k: v for k, v in document.items() if k not in skip}
+    converted, changed = to_raw_ciphertext(encrypted)
+    return converted if changed else None
+
+
+def _convert_profile(document):
+    converted, changed = to_raw_ciphertext(document.get("profile") or {})
+    return {"profile": converted} if changed else None
+
+
+def _convert_patients_assigned(document):
+    assigned = (document.get("profile") or {}).get("patients_assigned")
+    return {"profile.patients_assigned": [assigned]} if isinstance(assigned, str) else None
+
+
+def migrate_patients_assigned_to_list(batch_size=MIGRATION_BATCH_SIZE, restart=False):
+    """Rewrites caregivers' single `patients_assigned` ID as a list of IDs. Resumable."""
+    return _migrate_collection(
+        "patients-assigned-list", mongo.db.users,
+        {"role": "caregiver", "profile.patients_assigned": {"$type": "string"}},
+        _convert_patients_assigned, batch_size, restart,
+    )
+
+
+def migrate_ciphertext_to_binary(batch_size=MIGRATION_BATCH_SIZE, restart=False):
+    """
+    Rewrites base64 ciphertexts in patient profiles and medications as raw BSON Binary.
+    Resumable: progress is checkpointed per batch in the `migrations` collection.
+    """
+    return {
+        "users": _migrate_collection(
+            "ciphertext-binary:users", mongo.db.users, {"role": "patient"},
+            _convert_profile, batch_size, restart,
+        ),
+        "medications": _migrate_collection(
+            "ciphertext-binary:medications", mongo.db.medications, {},
+            _convert_medication, batch_size, restart,
+        ),
+    }
+
+
+def migrate_dose_timezones(batch_size=MIGRATION_BATCH_SIZE, restart=False):
+    """
+    Copies each medication's timezone onto its doses created before doses
+    stored one, so the adherence rollups bucket them into the patient's local
+    days. Resumable, one bulk write per batch of medications.
+    """
+    name = "dose-timezones"
+    last_id = None if restart else _get_checkpoint(name)
+    updated = 0
+
+    while True:
+        query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+        batch = list(mongo.db.medications.find(query, {"timezone": 1}).sort("_id", ASCENDING).limit(batch_size))
+        if not batch:
+            break
+
+        result = mongo.db.doses.bulk_write([
+            UpdateMany(
+                {"medication_id": str(medication["_id"]), "timezone": {"$exists": False}},
+                {"$set": {"timezone": medication.get("timezone")}},
+            )
+            for medication in batch
+        ], ordered=False)
+        updated += result.modified_count
+
+        last_id = batch[-1]["_id"]
+        _save_checkpoint(name, last_id, len(batch))
+        print(f"[{name}] updated {updated} doses so far")
+
+    _save_checkpoint(name, last_id, 0, done=True)
+    return updated
@@ -1,56 +1,140 @@
+import os
 from bson import ObjectId
-from datetime import datetime
 from app.database import mongo
-from app.utils.firebase_config import send_push_notification 
-from app.utils.encryption import decrypt_data
+from app.utils.cache import TTLCache
+from app.utils.notification_outbox import enqueue_coalesced_many, register_renderer
 
-def send_missed_medication_notification(user_id, medication_name):
+MISSED_MEDICATIONS_TEMPLATE = "missed_medications"
+
+# Short-lived patient -> caregiver mapping, invalidated when a caregiver is assigned
+caregiver_cache = TTLCache(
+    max_entries=int(os.getenv("CAREGIVER_CACHE_MAX_ENTRIES", 10000)),
+    ttl=int(os.getenv("CAREGIVER_CACHE_TTL", 60)),
+)
+
+
+def invalidate_caregiver_cache(patient_ids):
+    """Drops the cached caregiver mapping of one or more patients, e.g. after a caregiver is assigned."""
+    if isinstance(patient_ids, (str, ObjectId)):
+        patient_ids = [patient_ids]
+    for patient_id in patient_ids:
+        caregiver_cache.invalidate(str(patient_id))
+
+
+def resolve_caregivers(patient_ids):
     """
-    Sends a push notification to the caregiver if a patient's medication is missed
-    and stores the notification details in MongoDB.
+    Resolves patients to their name and assigned caregiver in bulk.
+    Returns {patient_id: {"patient_name", "caregiver_id", "fcm_token"}} for valid
+    patients; caregiver_id / fcm_token are None if no caregiver is assigned.
+    Uncached patients cost two `$in` queries in total, however many there are.
     """
-    # Fetch patient details
-    user = mongo.db.users.find_one({"_id": ObjectId(user_id)})
-    if not user or user.get("role") != "patient":
-        return "Invalid patient user."
-
-    # Extract patient name
-    patient_name = user.get("name", "Unknown Patient")
-
-    # Find caregiver assigned to this patient
-    caregiver = mongo.db.users.find_one({"profile.patients_assigned": user_id})
-
-    # Check if caregiver is found
-    if not caregiver:
-        print(f"No caregiver assigned to patient {user_id}. Notification not sent.")
-        return
-
-    # Extract caregiver FCM token and ID
-    caregiver_fcm_token = caregiver.get("profile", {}).get("fcm_token")
-    caregiver_id = str(caregiver["_id"])
-
-    if not caregiver_fcm_token:
-        print(f"No valid FCM token found for caregiver of patient {user_id}.")
-        return
-
-    # Prepare notification content
-    title = f"Missed Medication Alert: {medication_name} for {patient_name}"
-    body = f"{patient_name} (Patient ID: {user_id}) has missed their scheduled medication: {medication_name}. Please follow up accordingly."
-
-    # Send push notification via Firebase
-    success_count = send_push_notification(caregiver_fcm_token, title, body)
-
-    # Store notification details in MongoDB
-    notification_entry = {
-        "patient_id": str(user_id),
-        "caregiver_id": caregiver_id,
-        "medication_name": medication_name,
-        "title": title,
-        "body": body,
-        "timestamp": datetime.utcnow(),
-        "status": "sent" if success_count > 0 else "failed"
+    patient_ids = {str(patient_id) for patient_id in patient_ids}
+    resolved = {}
+    missing = []
+
+    for patient_id in patient_ids:
+        cached = caregiver_cache.get(patient_id)
+        if cached is not None:
+            if cached:  # Empty dict caches "not a patient"
+                resolved[patient_id] = cached
+        else:
+            missing.append(patient_id)
+
+    if not missing:
+        return resolved
+
+    patients = mongo.db.users.find(
+        {"_id": {"$in": [ObjectId(patient_id) for patient_id in missing]}, "role": "patient"},
+        {"name": 1},
+    )
+    found = {
+        str(patient["_id"]): {"patient_name": patient.get("name", "Unknown Patient"), "caregiver_id": None, "fcm_token": None}
+        for patient in patients
     }
 
-    mongo.db.notifications.insert_one(notification_entry)
+    # Uses the profile.patients_assigned index; matches single IDs and lists of IDs
+    caregivers = mongo.db.users.find(
+        {"profile.patients_assigned": {"$in": list(found)}},
+        {"profile.patients_assigned": 1, "profile.fcm_token": 1},
+    )
+    for caregiver in caregivers:
+        assigned = caregiver.get("profile", {}).get("patients_assigned")
+        assigned = assigned if isinstance(assigned, list) else [assigned]
+        for patient_id in assigned:
+            if patient_id in found and found[patient_id]["caregiver_id"] is None:
+                found[patient_id]["caregiver_id"] = str(caregiver["_id"])
+                found[patient_id]["fcm_token"] = caregiver.get("profile", {}).get("fcm_token")
+
+    for patient_id in missing:
+        caregiver_cache.set(patient_id, found.get(patient_id, {}))
+    resolved.update(found)
+    return resolved
+
+
+def render_missed_medications(entry):
+    """Builds one notification listing every medication a patient missed within the coalescing window."""
+    patient_name = entry["context"]["patient_name"]
+    patient_id = entry["context"]["patient_id"]
+    names = list(dict.fromkeys(entry["items"]))  # Drop duplicates, keep order
+
+    if len(names) == 1:
+        title = f"Missed Medication Alert: {names[0]} for {patient_name}"
+        body = f"{patient_name} (Patient ID: {patient_id}) has missed their scheduled medication: {names[0]}. Please follow up accordingly."
+    else:
+        title = f"Missed Medication Alert: {len(names)} medications for {patient_name}"
+        body = f"{patient_name} (Patient ID: {patient_id}) has missed their scheduled medications: {', '.join(names)}. Please follow up accordingly."
+
+    return title, body, {"medication_name": ", ".join(names), "medication_names": names}
+
 
-    print(f"Notification sent to caregiver {caregiver_id} for missed medication: {medication_name}")
+register_renderer(MISSED_MEDICATIONS_TEMPLATE, render_missed_medications)
+
+
+def send_missed_medication_notifications(missed_medications):
+    """
+    Queues caregiver notifications for many missed medications at once.
+    `missed_medications` is a list of (user_id, medication_name) pairs; patients
+    and caregivers are resolved in bulk and misses for the same patient and
+    caregiver are coalesced into one digest per window with one bulk write.
+    """
+    recipients = resolve_caregivers(user_id for user_id, _ in missed_medications)
+    notifications = []
+
+    for user_id, medication_name in missed_medications:
+        recipient = recipients.get(str(user_id))
+        if not recipient:
+            print(f"Invalid patient user {user_id}. Notification not sent.")
+            continue
+
+        # Check if caregiver is found
+        if not recipient["caregiver_id"]:
+            print(f"No caregiver assigned to patient {user_id}. Notification not sent.")
+            continue
+
+        if not recipient["fcm_token"]:
+            print(f"No valid FCM token found for caregiver of patient {user_id}.")
+            continue
+
+        # Title/body are rendered when the digest is sent
+        notifications.append((
+            f"missed:{user_id}:{recipient['caregiver_id']}",
+            recipient["fcm_token"],
+            MISSED_MEDICATIONS_TEMPLATE,
+            medication_name,
+            {"patient_name": recipient["patient_name"], "patient_id": str(user_id)},
+            {"patient_id": str(user_id), "caregiver_id": recipient["caregiver_id"]},
+        ))
+
+    # Queue the push notifications; delivery and the `notifications` records happen in the dispatcher
+    enqueue_coalesced_many(notifications)
+    if notifications:
+        print(f"Queued {len(notifications)} missed medication notifications.")
+    return len(notifications)
+
+
+def send_missed_medication_notification(user_id, medication_name):
+    """
+    Queues a push notification to the caregiver if a patient's medication is missed.
+    The outbox dispatcher sends it and stores the notification details in MongoDB.
+    """
+    return send_missed_medication_notifications([(user_id, medication_name)])
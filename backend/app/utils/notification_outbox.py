@@ -0,0 +1,247 @@
+import os
+from datetime import datetime, timedelta, timezone
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import BulkWriteError
+from app.database import mongo
+from app.utils.push_transport import get_transport
+
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", 500))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", 5))
+OUTBOX_BACKOFF_SECONDS = int(os.getenv("OUTBOX_BACKOFF_SECONDS", 30))  # Doubles after every failed attempt
+OUTBOX_RETENTION_DAYS = int(os.getenv("OUTBOX_RETENTION_DAYS", 7))  # Finished entries are then removed by a TTL index
+OUTBOX_CLAIM_TIMEOUT_SECONDS = 300  # Entries claimed by a dispatcher that died are retried after this
+
+# Coalescing: notifications with the same group key (e.g. patient + caregiver)
+# queued within this window are sent as one digest
+COALESCE_WINDOW_SECONDS = int(os.getenv("NOTIFICATION_COALESCE_WINDOW_SECONDS", 120))
+# Per-device rate limit: at most this many pushes per token per window
+DEVICE_RATE_LIMIT = int(os.getenv("NOTIFICATION_DEVICE_RATE_LIMIT", 6))
+DEVICE_RATE_WINDOW_SECONDS = int(os.getenv("NOTIFICATION_DEVICE_RATE_WINDOW_SECONDS", 3600))
+DEVICE_RATE_DEFER_SECONDS = 300  # Rate-limited entries are retried after this
+# Due statuses: "pending" entries, and "deferred" ones put back after a claim
+# (rate-limited or reclaimed from a dead dispatcher). A digest claimed once may
+# already have a newer open digest for its group, so it is never put back as
+# "pending" with attempts 0: that would break the unique open-digest index.
+DUE_STATUSES = ["pending", "deferred"]
+COALESCE_UPSERT_RETRIES = 3
+DUPLICATE_KEY_ERROR = 11000
+
+# template name -> function(entry) returning (title, body, record fields) for digests
+_renderers = {}
+
+
+def register_renderer(template, render):
+    """Registers how digests of `template` are turned into (title, body, record fields) at send time."""
+    _renderers[template] = render
+
+
+def _outbox_entry(token, title, body, record, now):
+    return {
+        "token": token,
+        "title": title,
+        "body": body,
+        "record": record,
+        "status": "pending",
+        "attempts": 0,
+        "created_at": now,
+        "next_attempt_at": now,
+    }
+
+
+def enqueue_notification(token, title, body, record):
+    """
+    Queues a push notification for the background dispatcher instead of sending it inline.
+    `record` holds the fields stored in `notifications` once delivery finishes
+    (patient_id, caregiver_id, medication_name).
+    """
+    mongo.db.notification_outbox.insert_one(_outbox_entry(token, title, body, record, datetime.now(timezone.utc)))
+
+
+def enqueue_notifications(notifications):
+    """Queues many (token, title, body, record) notifications with a single insert."""
+    now = datetime.now(timezone.utc)
+    entries = [_outbox_entry(token, title, body, record, now) for token, title, body, record in notifications]
+    if entries:
+        mongo.db.notification_outbox.insert_many(entries, ordered=False)
+
+
+def enqueue_coalesced(group_key, token, template, item, context, record):
+    """
+    Adds `item` to the open digest for `group_key`, opening a new one (due in
+    COALESCE_WINDOW_SECONDS) if none is pending. The digest is rendered by the
+    `template` renderer when it is sent.
+    """
+    enqueue_coalesced_many([(group_key, token, template, item, context, record)])
+
+
+def enqueue_coalesced_many(items):
+    """Bulk form of `enqueue_coalesced` taking (group_key, token, template, item, context, record) tuples."""
+    now = datetime.now(timezone.utc)
+    operations = [
+        UpdateOne(
+            {"group_key": group_key, "status": "pending", "attempts": 0},
+            {
+                "$push": {"items": item},
+                "$set": {"token": token},  # Latest device token wins
+                "$setOnInsert": {
+                    "template": template,
+                    "context": context,
+                    "record": record,
+                    "created_at": now,
+                    "next_attempt_at": now + timedelta(seconds=COALESCE_WINDOW_SECONDS),
+                },
+            },
+            upsert=True,
+        )
+        for group_key, token, template, item, context, record in items
+    ]
+    # Workers enqueue concurrently: an upsert that races another worker's insert
+    # of the same digest fails on the unique group_key index. Re-running it then
+    # matches the digest that won, so only those upserts are retried.
+    for _ in range(COALESCE_UPSERT_RETRIES):
+        if not operations:
+            return
+        try:
+            mongo.db.notification_outbox.bulk_write(operations, ordered=False)
+            return
+        except BulkWriteError as e:
+            write_errors = e.details.get("writeErrors", [])
+            if any(error["code"] != DUPLICATE_KEY_ERROR for error in write_errors):
+                raise
+            operations = [operations[error["index"]] for error in write_errors]
+    mongo.db.notification_outbox.bulk_write(operations, ordered=False)
+
+
+def _render(entry):
+    """Returns (title, body, record) for an entry, rendering digests from their items."""
+    if entry.get("template"):
+        title, body, fields = _renderers[entry["template"]](entry)
+        return title, body, {**entry["record"], **fields}
+    return entry["title"], entry["body"], entry["record"]
+
+
+def _recent_send_counts(tokens, now):
+    """Pushes sent to each token within the rate-limit window, in one aggregation."""
+    counts = mongo.db.notification_outbox.aggregate([
+        {"$match": {
+            "token": {"$in": list(tokens)},
+            "status": "sent",
+            "completed_at": {"$gte": now - timedelta(seconds=DEVICE_RATE_WINDOW_SECONDS)},
+        }},
+        {"$group": {"_id": "$token", "count": {"$sum": 1}}},
+    ])
+    return {row["_id"]: row["count"] for row in counts}
+
+
+def _claim_batch(batch_size, now):
+    """
+    Marks a batch of due entries as "sending" so digests stop accepting items
+    while they are sent, then re-reads them to pick up any last-moment items.
+    """
+    # Entries left "sending" by a dispatcher that died go back to the queue
+    mongo.db.notification_outbox.update_many(
+        {"status": "sending", "claimed_at": {"$lte": now - timedelta(seconds=OUTBOX_CLAIM_TIMEOUT_SECONDS)}},
+        {"$set": {"status": "deferred"}},
+    )
+
+    due = mongo.db.notification_outbox.find(
+        {"status": {"$in": DUE_STATUSES}, "next_attempt_at": {"$lte": now}}, {"_id": 1}
+    ).sort("next_attempt_at", ASCENDING).limit(batch_size)
+    ids = [entry["_id"] for entry in due]
+    if not ids:
+        return []
+
+    mongo.db.notification_outbox.update_many(
+        {"_id": {"$in": ids}, "status": {"$in": DUE_STATUSES}},
+        {"$set": {"status": "sending", "claimed_at": now}},
+    )
+    return list(mongo.db.notification_outbox.find({"_id": {"$in": ids}, "status": "sending", "claimed_at": now}))
+
+
+def _backoff(attempts):
+    return timedelta(seconds=OUTBOX_BACKOFF_SECONDS * 2 ** (attempts - 1))
+
+
+def dispatch_outbox(transport=None, batch_size=OUTBOX_BATCH_SIZE, now=None):
+    """
+    Sends one batch of due outbox entries and writes the results back in bulk:
+    outbox statuses, `notifications` history records, and removal of FCM tokens
+    reported as no longer registered. Digests are rendered here, and devices over
+    the rate limit are deferred. Returns the number of entries processed.
+    """
+    transport = transport or get_transport()
+    now = now or datetime.now(timezone.utc)
+
+    claimed = _claim_batch(batch_size, now)
+    if not claimed:
+        return 0
+
+    outbox_updates = []
+    history = []
+    dead_tokens = set()
+
+    # Per-device rate limit: over-limit entries are deferred; new items for the
+    # same group meanwhile open a new digest
+    sent_counts = _recent_send_counts({entry["token"] for entry in claimed}, now)
+    pending = []
+    for entry in claimed:
+        if sent_counts.get(entry["token"], 0) >= DEVICE_RATE_LIMIT:
+            outbox_updates.append(UpdateOne({"_id": entry["_id"]}, {"$set": {
+                "status": "deferred", "next_attempt_at": now + timedelta(seconds=DEVICE_RATE_DEFER_SECONDS),
+            }}))
+            continue
+        sent_counts[entry["token"]] = sent_counts.get(entry["token"], 0) + 1
+        pending.append((entry, *_render(entry)))
+
+    try:
+        results = transport.send_batch([
+            {"token": entry["token"], "title": title, "body": body} for entry, title, body, _ in pending
+        ]) if pending else []
+    except Exception as e:
+        # A transport error must not lose the batch's writes (rate-limit deferrals
+        # included) or leave it "sending": retry it with the attempt counted
+        print(f"Push transport failed: {e}")
+        results = [("retry", str(e)) for _ in pending]
+
+    for (entry, title, body, record), (outcome, detail) in zip(pending, results):
+        attempts = entry["attempts"] + 1
+
+        if outcome == "retry" and attempts < OUTBOX_MAX_ATTEMPTS:
+            outbox_updates.append(UpdateOne({"_id": entry["_id"]}, {"$set": {
+                "status": "pending", "attempts": attempts, "last_error": detail, "next_attempt_at": now + _backoff(attempts),
+            }}))
+            continue
+
+        status = "sent" if outcome == "sent" else "failed"
+        if outcome == "dead_token":
+            dead_tokens.add(entry["token"])
+
+        outbox_updates.append(UpdateOne({"_id": entry["_id"]}, {"$set": {
+            "status": status, "attempts": attempts, "last_error": None if status == "sent" else detail, "completed_at": now,
+        }}))
+        history.append({
+            **record,
+            "title": title,
+            "body": body,
+            "timestamp": now,
+            "status": status,
+        })
+
+    mongo.db.notification_outbox.bulk_write(outbox_updates, ordered=False)
+    if history:
+        mongo.db.notifications.insert_many(history, ordered=False)
+    if dead_tokens:
+        mongo.db.users.update_many({"profile.fcm_token": {"$in": list(dead_tokens)}}, {"$unset": {"profile.fcm_token": ""}})
+        print(f"Removed {len(dead_tokens)} unregistered FCM tokens.")
+
+    return len(claimed)
+
+
+def drain_outbox(transport=None, batch_size=OUTBOX_BATCH_SIZE):
+    """Dispatches batches until no due entries are left. Returns the total processed."""
+    total = 0
+    while True:
+        processed = dispatch_outbox(transport, batch_size)
+        total += processed
+        if processed < batch_size:
+            return total
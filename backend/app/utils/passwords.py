@@ -0,0 +1,161 @@
+import asyncio
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from werkzeug.security import generate_password_hash, check_password_hash
+from app.utils.metrics import password_rejections
+
+# Password hashing is slow by design, so it runs in a small process pool
+# instead of on the request thread (or the GIL). At most PASSWORD_QUEUE_SIZE
+# operations may be running or waiting; further callers get PasswordHasherBusy
+# (HTTP 503) straight away instead of piling up behind a login storm.
+PASSWORD_POOL_SIZE = int(os.getenv("PASSWORD_POOL_SIZE", min(4, os.cpu_count() or 1)))  # 0 = hash inline
+PASSWORD_QUEUE_SIZE = int(os.getenv("PASSWORD_QUEUE_SIZE", max(PASSWORD_POOL_SIZE, 1) * 8))
+PASSWORD_TIMEOUT_SECONDS = float(os.getenv("PASSWORD_TIMEOUT_SECONDS", 10))
+PASSWORD_RETRY_AFTER_SECONDS = int(os.getenv("PASSWORD_RETRY_AFTER_SECONDS", 1))
+
+# Werkzeug method string, e.g. "scrypt:32768:8:1" or "pbkdf2:sha256:600000".
+# Stored hashes made with other parameters are replaced on the user's next login.
+PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+
+
+class PasswordHasherBusy(RuntimeError):
+    """Raised when the hashing pool is saturated; the client should retry later."""
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(PASSWORD_QUEUE_SIZE)
+
+
+def _get_pool():
+    """Creates the pool on first use, and again in a worker forked after that."""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            # Never fork: the calling process already runs scheduler, due-timer
+            # and pymongo threads whose locks a forked child would inherit
+            start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _pool = ProcessPoolExecutor(max_workers=PASSWORD_POOL_SIZE, mp_context=multiprocessing.get_context(start_method))
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def _reset_pool(broken):
+    """Drops a pool whose worker process died so the next call starts a fresh one."""
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            _pool = None
+    print("Password hashing pool broke; starting a new one")
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None and _pool_pid == os.getpid():
+        _pool.shutdown(wait=False, cancel_futures=True)
+    _pool = None
+
+
+atexit.register(shutdown_pool)
+
+
+def hash_method(stored_hash):
+    """The werkzeug method a stored hash was made with, e.g. "scrypt:32768:8:1"."""
+    return stored_hash.split("$", 1)[0]
+
+
+@lru_cache(maxsize=None)
+def configured_method():
+    """
+    PASSWORD_HASH_METHOD as werkzeug writes it into hashes, parameters filled
+    in (e.g. "scrypt" -> "scrypt:32768:8:1"), so outdated hashes compare unequal
+    and current ones equal. Taken from one hash of an empty password.
+    """
+    return hash_method(generate_password_hash("", method=PASSWORD_HASH_METHOD))
+
+
+# Run in the pool processes
+def _hash(password, method):
+    return generate_password_hash(password, method=method)
+
+
+def _verify(stored_hash, password, method):
+    """Checks the password and, if it matches an outdated hash, also returns a new hash."""
+    if not check_password_hash(stored_hash, password):
+        return False, None
+    if hash_method(stored_hash) != method:
+        return True, generate_password_hash(password, method=method)
+    return True, None
+
+
+def _submit(operation, func, *args):
+    """Queues `func(*args)` on the pool, or raises PasswordHasherBusy if the queue is full."""
+    if not _slots.acquire(blocking=False):
+        password_rejections.inc(operation=operation)
+        raise PasswordHasherBusy("Too many password operations in progress")
+    try:
+        future = _get_pool().submit(func, *args)
+    except Exception:
+        _slots.release()
+        raise
+    future.add_done_callback(lambda _: _slots.release())
+    return future
+
+
+def _run(operation, func, *args):
+    if PASSWORD_POOL_SIZE <= 0:
+        return func(*args)
+    pool = _get_pool()
+    try:
+        return _submit(operation, func, *args).result(timeout=PASSWORD_TIMEOUT_SECONDS)
+    except FutureTimeoutError:
+        raise PasswordHasherBusy("Password operation timed out")
+    except BrokenProcessPool:
+        _reset_pool(pool)
+        raise PasswordHasherBusy("Password hashing pool restarted")
+
+
+async def _run_async(operation, func, *args):
+    if PASSWORD_POOL_SIZE <= 0:
+        return func(*args)
+    pool = _get_pool()
+    try:
+        return await asyncio.wait_for(
+            asyncio.wrap_future(_submit(operation, func, *args)), PASSWORD_TIMEOUT_SECONDS,
+        )
+    except asyncio.TimeoutError:
+        raise PasswordHasherBusy("Password operation timed out")
+    except BrokenProcessPool:
+        _reset_pool(pool)
+        raise PasswordHasherBusy("Password hashing pool restarted")
+
+
+def hash_password(password):
+    """Hashes a new password with PASSWORD_HASH_METHOD in the pool."""
+    return _run("hash", _hash, password, PASSWORD_HASH_METHOD)
+
+
+def verify_password(stored_hash, password):
+    """
+    Verifies `password` against `stored_hash` in the pool. Returns
+    (matches, new_hash); new_hash is set when the password matched but the
+    stored hash was made with other parameters and should be replaced.
+    """
+    return _run("verify", _verify, stored_hash, password, configured_method())
+
+
+async def hash_password_async(password):
+    """hash_password for the ASGI app: awaits the pool without blocking the event loop."""
+    return await _run_async("hash", _hash, password, PASSWORD_HASH_METHOD)
+
+
+async def verify_password_async(stored_hash, password):
+    """verify_password for the ASGI app."""
+    return await _run_async("verify", _verify, stored_hash, password, configured_method())
@@ -0,0 +1,48 @@
+import os
+
+PUSH_TRANSPORT = os.getenv("PUSH_TRANSPORT", "firebase")  # "firebase" or "fake"
+
+_transport = None
+
+
+class FakeTransport:
+    """
+    Local stand-in for FirebaseTransport used in tests, benchmarks and
+    development. Records every message; tokens listed in `dead_tokens` or
+    `flaky_tokens` report "dead_token" / "retry" instead of "sent".
+    """
+
+    def __init__(self, dead_tokens=(), flaky_tokens=()):
+        self.sent = []
+        self.dead_tokens = set(dead_tokens)
+        self.flaky_tokens = set(flaky_tokens)
+
+    def send_batch(self, messages):
+        results = []
+        for message in messages:
+            if message["token"] in self.dead_tokens:
+                results.append(("dead_token", "Token is not registered"))
+            elif message["token"] in self.flaky_tokens:
+                results.append(("retry", "Service unavailable"))
+            else:
+                self.sent.append(message)
+                results.append(("sent", f"fake-{len(self.sent)}"))
+        return results
+
+
+def get_transport():
+    """Returns the configured push transport, creating it on first use."""
+    global _transport
+    if _transport is None:
+        if PUSH_TRANSPORT == "fake":
+            _transport = FakeTransport()
+        else:
+            from app.utils.firebase_config import FirebaseTransport  # Firebase itself initializes on first send
+            _transport = FirebaseTransport()
+    return _transport
+
+
+def set_transport(transport):
+    """Replaces the push transport (e.g. with a FakeTransport in tests)."""
+    global _transport
+    _transport = transport
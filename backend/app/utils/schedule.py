@@ -0,0 +1,141 @@
+import os
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+TIME_FORMATS = ("%I:%M %p", "%H:%M")  # '08:00 AM' from the API, '08:00' from <input type="time">
+
+# Days between doses for the frequencies offered by the frontend; anything
+# not listed is treated as daily. "As needed" has no due time.
+FREQUENCY_INTERVAL_DAYS = {
+    "every other day": 2,
+    "weekly": 7,
+}
+UNSCHEDULED_FREQUENCIES = {"as needed"}
+
+# Doses per scheduled day, spaced evenly from the first dose time
+DOSES_PER_DAY = {
+    "twice daily": 2,
+    "three times daily": 3,
+    "four times daily": 4,
+}
+
+DEFAULT_TIMEZONE = os.getenv("DEFAULT_TIMEZONE")  # IANA name, falls back to the server's local zone
+
+def convert_to_24_hour(time_str):
+    """Converts '08:00 AM' (or an already 24-hour '08:00') to 'HH:MM' 24-hour format."""
+    time_str = str(time_str).strip()
+    for time_format in TIME_FORMATS:
+        try:
+            return datetime.strptime(time_str, time_format).strftime("%H:%M")
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognised time format: {time_str}")
+
+
+def get_timezone(tz_name=None):
+    """Returns the tzinfo for an IANA name, the configured default, or the server's local zone."""
+    tz_name = tz_name or DEFAULT_TIMEZONE
+    if tz_name:
+        try:
+            return ZoneInfo(tz_name)
+        except (ZoneInfoNotFoundError, ValueError):
+            raise ValueError(f"Unknown time zone: {tz_name}")
+    return datetime.now().astimezone().tzinfo
+
+
+def interval_days(frequency):
+    """Days between doses, or None if the medication has no fixed schedule."""
+    frequency = str(frequency or "").strip().lower()
+    if frequency in UNSCHEDULED_FREQUENCIES:
+        return None
+    return FREQUENCY_INTERVAL_DAYS.get(frequency, 1)
+
+
+def compute_next_due_at(time_str, frequency, tz_name=None, after=None):
+    """
+    Returns the next UTC due time strictly after `after` (default: now) for a
+    medication taken at local time-of-day `time_str` in time zone `tz_name`.
+    Returns None for unscheduled ("as needed") medications.
+    """
+    days = interval_days(frequency)
+    if days is None:
+        return None
+
+    tz = get_timezone(tz_name)
+    after = after or datetime.now(timezone.utc)
+    if after.tzinfo is None:  # PyMongo returns naive UTC datetimes
+        after = after.replace(tzinfo=timezone.utc)
+
+    hour, minute = map(int, convert_to_24_hour(time_str).split(":"))
+    local_after = after.astimezone(tz)
+
+    # Build on the local calendar date so DST changes keep the wall-clock time
+    candidate_date = local_after.date()
+    while True:
+        candidate = datetime(candidate_date.year, candidate_date.month, candidate_date.day, hour, minute, tzinfo=tz)
+        if candidate > local_after:
+            return candidate.astimezone(timezone.utc)
+        candidate_date += timedelta(days=1)
+
+
+def roll_forward(due_at, time_str, frequency, tz_name=None, now=None):
+    """
+    Moves a due time forward by whole intervals until it is in the future.
+    Used after a dose is taken so the medication becomes due again.
+    """
+    days = interval_days(frequency)
+    if days is None:
+        return None
+
+    now = now or datetime.now(timezone.utc)
+    if due_at is None:
+        return compute_next_due_at(time_str, frequency, tz_name, after=now)
+    if due_at.tzinfo is None:
+        due_at = due_at.replace(tzinfo=timezone.utc)
+
+    next_due = compute_next_due_at(time_str, frequency, tz_name, after=due_at + timedelta(days=days - 1))
+    while next_due <= now:
+        next_due = compute_next_due_at(time_str, frequency, tz_name, after=next_due + timedelta(days=days - 1))
+    return next_due
+
+
+def doses_per_day(frequency):
+    return DOSES_PER_DAY.get(str(frequency or "").strip().lower(), 1)
+
+
+def dose_times(time_str, frequency, tz_name, start, end, anchor=None):
+    """
+    Yields every UTC dose time in [start, end) for a medication whose first daily
+    dose is at local `time_str`. Multi-dose frequencies are spaced evenly over
+    the day (e.g. twice daily = first dose + 12h). `anchor` is the first day of
+    the schedule, used to keep "every other day" / "weekly" on the right days.
+    """
+    days = interval_days(frequency)
+    if days is None:
+        return
+
+    tz = get_timezone(tz_name)
+    hour, minute = map(int, convert_to_24_hour(time_str).split(":"))
+    per_day = doses_per_day(frequency)
+    spacing = timedelta(hours=24 / per_day)
+
+    start, end = _as_utc(start), _as_utc(end)
+    local_start = start.astimezone(tz)
+    anchor_date = _as_utc(anchor).astimezone(tz).date() if anchor else local_start.date()
+
+    day = local_start.date() - timedelta(days=1)  # Doses late in the previous day can fall after `start`
+    while True:
+        first = datetime(day.year, day.month, day.day, hour, minute, tzinfo=tz)
+        if first.astimezone(timezone.utc) >= end:
+            return
+        if (day - anchor_date).days % days == 0:
+            for i in range(per_day):
+                due_at = (first + spacing * i).astimezone(timezone.utc)
+                if start <= due_at < end:
+                    yield due_at
+        day += timedelta(days=1)
+
+
+def _as_utc(value):
+    """PyMongo returns naive UTC datetimes; make them timezone-aware."""
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
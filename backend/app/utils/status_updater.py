@@ -1,50 +1,259 @@
+import os
+import atexit
 from apscheduler.schedulers.background import BackgroundScheduler
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
 from pymongo import UpdateOne
-from app.utils.encryption import encrypt_data, decrypt_profile_data, decrypt_data
+from app.utils.encryption import decrypt_documents
 from app.database import mongo
-from app.utils.notification import send_missed_medication_notification
+from app.utils.notification import send_missed_medication_notifications
+from app.utils.schedule import convert_to_24_hour, compute_next_due_at
+from app.utils.lease import acquire_lease, holds_lease, release_lease, fence_write
+from app.utils.doses import extend_dose_horizon, mark_overdue_doses_missed, SWEEP_TOKEN_FIELD
+from app.utils.due_timer import due_timer, TRACKED_STATUSES
+from app.utils.notification_outbox import drain_outbox
+from app.utils.metrics import track_job
+from app.utils.adherence import record_transitions
 
 scheduler = BackgroundScheduler()
 
-def convert_to_24_hour(time_str):
-    """Converts '08:00 AM' format to 'HH:MM' 24-hour format."""
-    return datetime.strptime(time_str, "%I:%M %p").strftime("%H:%M")
+# "interval" polls every minute; "event" fires each missed transition at its
+# due time from an in-process timer, with a low-frequency reconciliation sweep
+STATUS_UPDATER_MODE = os.getenv("STATUS_UPDATER_MODE", "interval")
+RECONCILE_INTERVAL_MINUTES = int(os.getenv("RECONCILE_INTERVAL_MINUTES", 15))
+MISSED_GRACE_MINUTES = int(os.getenv("MISSED_GRACE_MINUTES", 0))
+MISSED_NOTIFICATIONS_ENABLED = os.getenv("MISSED_NOTIFICATIONS_ENABLED", "false").lower() == "true"
 
-def update_missed_medications():
-    """Updates medications whose time has passed but status is still 'upcoming' to 'missed' and notifies caregivers."""
-    
-    current_time = datetime.now().strftime("%H:%M")  # Get current time in 24-hour format
+SWEEP_INTERVAL_MINUTES = RECONCILE_INTERVAL_MINUTES if STATUS_UPDATER_MODE == "event" else 1
+SWEEP_LEASE = "missed-medication-sweep"
+# Longer than the interval so the holder renews before expiry; if it dies,
+# another worker takes over once the lease has expired
+SWEEP_LEASE_TTL = int(os.getenv("SWEEP_LEASE_TTL", SWEEP_INTERVAL_MINUTES * 60 + 30))
+
+# Due times loaded into the timer; each reconciliation reloads the next window
+TIMER_LOAD_WINDOW = timedelta(minutes=RECONCILE_INTERVAL_MINUTES * 4)
+# Medications and doses written by other processes reach this timer through a
+# short poll of the due times up to two intervals ahead, so each is loaded
+# before it fires (or at most one interval late if it was added just before)
+DUE_POLL_SECONDS = int(os.getenv("DUE_POLL_SECONDS", 30))
+
+DOSE_HORIZON_INTERVAL_MINUTES = 60
+DOSE_HORIZON_LEASE = "dose-horizon"
+
+OUTBOX_DISPATCH_INTERVAL_SECONDS = int(os.getenv("OUTBOX_DISPATCH_INTERVAL_SECONDS", 5))
+OUTBOX_LEASE = "notification-outbox"
+
+def update_missed_medications(fencing_token=None):
+    """
+    Updates medications whose time has passed but status is still 'upcoming' to 'missed' and notifies caregivers.
+    With a `fencing_token`, every write is fenced on it (see fence_write), so a
+    process that lost the sweep lease cannot overwrite the new holder's writes.
+    Returns the number of medications and doses updated, or None if the lease was lost.
+    """
     
-    # Find all upcoming medications
-    upcoming_medications = list(mongo.db.medications.find({"status": "upcoming"}))
+    now = datetime.now(timezone.utc)
+    cutoff = now - timedelta(minutes=MISSED_GRACE_MINUTES)
     
     update_operations = []
+    missed_ids = []
+
+    # Overdue doses come straight from the indexed UTC due time, no decryption needed
+    for med in mongo.db.medications.find(
+        {"status": {"$in": TRACKED_STATUSES}, "next_due_at": {"$lte": cutoff}},
+        {"_id": 1, "user_id": 1},
+    ):
+        update_operations.append((
+            {"_id": med["_id"], "status": {"$in": TRACKED_STATUSES}, "next_due_at": {"$lte": cutoff}},
+            {"$set": {"status": "missed"}},
+        ))
+        missed_ids.append(med["_id"])
+
+    # Medications stored before `next_due_at` existed: compare the decrypted
+    # time the old way and give them a due time so later sweeps use the index
+    current_time = datetime.now().strftime("%H:%M")  # Get current time in 24-hour format
+    legacy_medications = mongo.db.medications.find({"status": "upcoming", "next_due_at": {"$exists": False}})
+
+    for med in decrypt_documents(legacy_medications, fields=["time", "frequency"]):
+        # Legacy free-text times cannot be scheduled; skip them rather than abort the sweep
+        try:
+            changes = {"next_due_at": compute_next_due_at(med["time"], med["frequency"], med.get("timezone"), after=now)}
+            due_time = convert_to_24_hour(med["time"])
+        except ValueError as e:
+            print(f"Skipping medication {med['_id']} with unparseable time: {e}")
+            continue
+
+        # Compare the stored medication time (24-hour format) with current time
+        if due_time < current_time:
+            changes["status"] = "missed"
+            missed_ids.append(med["_id"])
+
+        update_operations.append(({"_id": med["_id"]}, {"$set": changes}))
     
-    for med in upcoming_medications:
-             
-        # Convert stored medication time to 24-hour format
-        med_time_24hr = convert_to_24_hour(decrypt_data(med["time"]))
-        
-        # Compare medication time with current time
-        if med_time_24hr < current_time:
-            
-            update_operations.append(
-                UpdateOne({"_id": med["_id"]}, {"$set": {"status": "missed"}})
-            )
-
-            # Call notification function with user_id and medication name
-            # send_missed_medication_notification(med["user_id"], decrypt_data(med["name"]))
-    
+    # Early exit; the writes below are fenced on the token either way
+    if fencing_token is not None and not holds_lease(SWEEP_LEASE, fencing_token):
+        print("Lost the sweep lease before writing; skipping this run.")
+        return None
+
+    if fencing_token is not None:
+        update_operations = [
+            fence_write(query, update, fencing_token, SWEEP_TOKEN_FIELD) for query, update in update_operations
+        ]
+
     # Bulk update all medications that need a status change
     if update_operations:
-        mongo.db.medications.bulk_write(update_operations)
-        print(f"Updated {len(update_operations)} medications to 'missed'.")
+        mongo.db.medications.bulk_write(
+            [UpdateOne(query, update) for query, update in update_operations], ordered=False
+        )
+        print(f"Updated {len(update_operations)} medications.")
 
-# Schedule the job to run every 1 minute
-scheduler.add_job(update_missed_medications, "interval", minutes=1)
-scheduler.start()
+    # Individual dose instances are a narrow indexed range on (status, due_at)
+    missed_doses = mark_overdue_doses_missed(cutoff, fencing_token=fencing_token)
+    if missed_doses:
+        print(f"Marked {len(missed_doses)} doses as missed.")
 
-# Ensure the scheduler shuts down properly on exit
-import atexit
-atexit.register(lambda: scheduler.shutdown(wait=False))
+    notify_missed_medications(missed_ids)
+    return len(update_operations) + len(missed_doses)
+
+
+def notify_missed_medications(medication_ids):
+    """Notifies caregivers about missed medications, decrypting their names in one batch."""
+    if not MISSED_NOTIFICATIONS_ENABLED or not medication_ids:
+        return
+
+    medications = mongo.db.medications.find({"_id": {"$in": list(medication_ids)}})
+    send_missed_medication_notifications(
+        [(med["user_id"], med["name"]) for med in decrypt_documents(medications, fields=["name"])]
+    )
+
+
+def on_medication_due(key, due_at):
+    """
+    Timer callback: marks one medication or dose missed at its due time.
+    The update is conditional on the stored due time, so entries made stale by
+    a later status change do nothing, and when several workers fire the same
+    entry only the one whose write succeeds sends the notification.
+    """
+    kind, document_id = key
+    if kind == "dose":
+        dose = mongo.db.doses.find_one_and_update(
+            {"_id": document_id, "status": "upcoming", "due_at": due_at}, {"$set": {"status": "missed"}},
+            {"medication_id": 1, "user_id": 1, "due_at": 1, "timezone": 1},
+        )
+        if dose:
+            record_transitions([(dose, "upcoming", "missed")])
+        return
+
+    medication_id = ObjectId(document_id)
+    result = mongo.db.medications.update_one(
+        {"_id": medication_id, "status": {"$in": TRACKED_STATUSES}, "next_due_at": due_at},
+        {"$set": {"status": "missed"}},
+    )
+    if result.modified_count:
+        notify_missed_medications([medication_id])
+
+
+due_timer.on_due = on_medication_due
+due_timer.grace_seconds = MISSED_GRACE_MINUTES * 60
+
+
+def load_due_times(until=None, since=None):
+    """Loads upcoming medication and dose due times (after `since`, up to `until`) into the timer; returns how many."""
+    until = until or datetime.now(timezone.utc) + TIMER_LOAD_WINDOW
+    window = {"$lte": until}
+    if since is not None:
+        window["$gte"] = since
+    loaded = 0
+
+    for med in mongo.db.medications.find(
+        {"status": {"$in": TRACKED_STATUSES}, "next_due_at": window}, {"_id": 1, "next_due_at": 1}
+    ):
+        due_timer.schedule(("medication", str(med["_id"])), med["next_due_at"])
+        loaded += 1
+
+    for dose in mongo.db.doses.find(
+        {"status": "upcoming", "due_at": window}, {"_id": 1, "due_at": 1}
+    ):
+        due_timer.schedule(("dose", dose["_id"]), dose["due_at"])
+        loaded += 1
+    return loaded
+
+
+_last_due_poll = None
+
+
+@track_job("due_time_poll")
+def run_due_time_poll():
+    """
+    Picks up due times added or moved by other processes (or the WSGI/ASGI app
+    in another worker), whose schedule_medication_due only reaches their own timer.
+    Starts at the previous poll so entries that fell due in between still fire.
+    """
+    global _last_due_poll
+    now = datetime.now(timezone.utc)
+    since = (_last_due_poll or now) - timedelta(seconds=MISSED_GRACE_MINUTES * 60 + DUE_POLL_SECONDS)
+    loaded = load_due_times(until=now + timedelta(seconds=DUE_POLL_SECONDS * 2), since=since)
+    _last_due_poll = now
+    return loaded
+
+
+@track_job("missed_medication_sweep")
+def run_missed_medication_sweep():
+    """Runs the sweep only in the process holding the sweep lease."""
+    if due_timer.running:
+        # Every worker tracks the next window so its own timer stays exact
+        load_due_times()
+
+    token = acquire_lease(SWEEP_LEASE, SWEEP_LEASE_TTL)
+    if token is None:
+        return None  # Another worker owns the sweep this interval
+    return update_missed_medications(fencing_token=token)
+
+
+@track_job("dose_horizon")
+def run_dose_horizon_job():
+    """Keeps dose instances generated DOSE_HORIZON_DAYS ahead, in one process only."""
+    if acquire_lease(DOSE_HORIZON_LEASE, DOSE_HORIZON_INTERVAL_MINUTES * 60 + 30) is None:
+        return None
+    return extend_dose_horizon()
+
+
+@track_job("outbox_dispatcher")
+def run_outbox_dispatcher():
+    """Drains the notification outbox in batches, in one process only."""
+    if acquire_lease(OUTBOX_LEASE, OUTBOX_DISPATCH_INTERVAL_SECONDS + 60) is None:
+        return None
+    return drain_outbox()
+
+
+def shutdown_scheduler():
+    scheduler.shutdown(wait=False)
+    due_timer.stop()
+    for lease in (SWEEP_LEASE, DOSE_HORIZON_LEASE, OUTBOX_LEASE):
+        try:
+            release_lease(lease)
+        except Exception as e:
+            print(f"Could not release lease '{lease}': {e}")
+
+
+def start_scheduler():
+    """
+    Starts the background jobs (called from create_app when START_SCHEDULER is set).
+    Importing this module has no side effects; calling this more than once is a no-op.
+    """
+    if scheduler.running:
+        return
+
+    if STATUS_UPDATER_MODE == "event":
+        due_timer.start()
+        load_due_times()
+
+    # Every minute in interval mode, every RECONCILE_INTERVAL_MINUTES as a drift check in event mode
+    scheduler.add_job(run_missed_medication_sweep, "interval", minutes=SWEEP_INTERVAL_MINUTES)
+    scheduler.add_job(run_dose_horizon_job, "interval", minutes=DOSE_HORIZON_INTERVAL_MINUTES, next_run_time=datetime.now())
+    scheduler.add_job(run_outbox_dispatcher, "interval", seconds=OUTBOX_DISPATCH_INTERVAL_SECONDS, max_instances=1)
+    if STATUS_UPDATER_MODE == "event":
+        scheduler.add_job(run_due_time_poll, "interval", seconds=DUE_POLL_SECONDS, max_instances=1)
+    scheduler.start()
+
+    # Ensure the scheduler shuts down properly on exit
+    atexit.register(shutdown_scheduler)
@@ -0,0 +1,48 @@
+import os
+from bson import ObjectId
+from bson.errors import InvalidId
+from flask import g, has_request_context
+from app.database import mongo
+from app.utils.cache import TTLCache
+
+# Authenticated users are looked up at most once per request and, across
+# requests, served from this short-lived cache. Writes that change a user's
+# role or profile call invalidate_user(); other processes see the change
+# within USER_CACHE_TTL seconds.
+user_cache = TTLCache(
+    max_entries=int(os.getenv("USER_CACHE_MAX_ENTRIES", 10000)),
+    ttl=int(os.getenv("USER_CACHE_TTL", 30)),
+)
+
+# Never kept in memory: only the login route needs the password hash
+USER_CACHE_PROJECTION = {"password": 0}
+
+
+def get_user(user_id):
+    """
+    Returns the user document (without the password hash) for `user_id`, or
+    None if there is no such user. Callers must not modify the returned dict.
+    """
+    user_id = str(user_id)
+    request_users = g.setdefault("users", {}) if has_request_context() else {}
+    if user_id in request_users:
+        return request_users[user_id]
+
+    user = user_cache.get(user_id)
+    if user is None:
+        try:
+            user = mongo.db.users.find_one({"_id": ObjectId(user_id)}, USER_CACHE_PROJECTION) or {}
+        except InvalidId:
+            user = {}
+        user_cache.set(user_id, user)  # Empty dict caches "no such user"
+
+    request_users[user_id] = user or None
+    return user or None
+
+
+def invalidate_user(user_id):
+    """Drops a user from both cache levels, e.g. after their role or profile changed."""
+    user_id = str(user_id)
+    user_cache.invalidate(user_id)
+    if has_request_context():
+        g.get("users", {}).pop(user_id, None)
@@ -0,0 +1,92 @@
+"""
+Caregiver dashboard latency as the caseload grows.
+
+Seeds a scratch database (MONGO_URI, default medbuddy_bench) with caregivers
+assigned 1, 10, 50 and 100 patients, each with a regimen of medications, then
+times caregiver_dashboard() for each caseload:
+
+    cd backend
+    python -m benchmarks.bench_caregiver_dashboard --medications 15 --repeat 50
+
+Latency should stay roughly flat: the dashboard is one aggregation plus one
+batch decrypt, whatever the number of patients.
+"""
+import argparse
+import base64
+import os
+import statistics
+import sys
+import time
+import uuid
+
+os.environ.setdefault("ENCRYPTION_KEY", base64.b64encode(os.urandom(32)).decode())
+os.environ.setdefault("HMAC_KEY", base64.b64encode(os.urandom(32)).decode())
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017/medbuddy_bench")
+os.environ.setdefault("DECRYPT_CACHE_ENABLED", "false")  # Measure the cold decrypt path
+
+from app import create_app
+from app.database import mongo
+from app.utils.caregivers import caregiver_dashboard
+from app.utils.encryption import encrypt_documents
+from app.utils.schedule import compute_next_due_at
+
+CASELOADS = (1, 10, 50, 100)
+
+
+def seed_caregiver(patients, medications):
+    """Inserts a caregiver with `patients` patients of `medications` medications each; returns its id."""
+    tag = uuid.uuid4().hex[:8]
+    patient_docs = [
+        {"name": f"Patient {i}", "email": f"bench-{tag}-{i}@example.com", "role": "patient", "profile": {}}
+        for i in range(patients)
+    ]
+    patient_ids = [str(_id) for _id in mongo.db.users.insert_many(patient_docs).inserted_ids]
+
+    plaintext = [
+        {"name": f"Medication {j}", "dosage": "10mg", "frequency": "once daily",
+         "time": f"{j % 12 + 1:02d}:00 AM", "instructions": "With water"}
+        for j in range(medications)
+    ]
+    documents = []
+    for patient_id in patient_ids:
+        for data, sealed in zip(plaintext, encrypt_documents(plaintext)):
+            documents.append({
+                **sealed, "user_id": patient_id, "status": "upcoming",
+                "next_due_at": compute_next_due_at(data["time"], data["frequency"]),
+            })
+    if documents:
+        mongo.db.medications.insert_many(documents)
+
+    caregiver = mongo.db.users.insert_one({
+        "name": "Bench Caregiver", "email": f"bench-{tag}-caregiver@example.com",
+        "role": "caregiver", "profile": {"patients_assigned": patient_ids},
+    })
+    return str(caregiver.inserted_id)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Caregiver dashboard latency by caseload")
+    parser.add_argument("--medications", type=int, default=15, help="Medications per patient")
+    parser.add_argument("--repeat", type=int, default=50, help="Timed dashboard builds per caseload")
+    args = parser.parse_args(argv)
+
+    app = create_app({"START_SCHEDULER": False})
+    with app.app_context():
+        print(f"{'patients':>8} {'medications':>12} {'median ms':>10} {'p95 ms':>8}")
+        for patients in CASELOADS:
+            caregiver_id = seed_caregiver(patients, args.medications)
+            caregiver_dashboard(caregiver_id)  # Warm up
+
+            times = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                caregiver_dashboard(caregiver_id)
+                times.append((time.perf_counter() - start) * 1000)
+            times.sort()
+            print(f"{patients:8d} {patients * args.medications:12d} {statistics.median(times):10.2f} "
+                  f"{times[min(len(times) - 1, int(len(times) * 0.95))]:8.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
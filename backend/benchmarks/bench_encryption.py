@@ -0,0 +1,206 @@
+"""
+Micro-benchmarks for app/utils/encryption.py.
+
+Runs offline with freshly generated keys (no .env or MongoDB needed):
+
+    cd backend
+    python -m benchmarks.bench_encryption --output results.json
+    python -m benchmarks.bench_encryption --compare results.json
+
+Reports ops/sec, per-call latency percentiles and bytes allocated per call,
+and writes machine-readable JSON so results can be compared between commits.
+"""
+import argparse
+import base64
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+# Keys must exist before app.utils.encryption is imported
+os.environ.setdefault("ENCRYPTION_KEY", base64.b64encode(os.urandom(32)).decode())
+os.environ.setdefault("HMAC_KEY", base64.b64encode(os.urandom(32)).decode())
+os.environ.setdefault("DECRYPT_CACHE_ENABLED", "false")  # Measure the cold crypto path by default
+
+from app.schemas.medication_schema import MedicationSchema
+from app.schemas.patient_schema import PatientProfileSchema
+from app.utils import encryption
+
+SIZES = {"small": 1, "medium": 5, "large": 20}
+
+
+def patient_profile(size):
+    """A realistic PatientProfileSchema payload with `size` entries in each list."""
+    return PatientProfileSchema(
+        dateOfBirth="1956-04-12",
+        gender="female",
+        emergencyContact={"emergencyName": "Asha Rao", "emergencyRelation": "daughter", "emergencyPhone": "9876543210"},
+        medicalInfo={
+            "allergies": [f"allergen-{i}" for i in range(size)],
+            "conditions": [f"condition-{i}" for i in range(size)],
+            "bloodType": "O+",
+            "physician": {"physicianName": "Dr. Mehta", "physicianPhone": "9123456780", "hospital": "City Hospital"},
+        },
+        notificationPreferences={"push": True},
+        healthGoals=[{"title": f"Walk {i + 1} km daily"} for i in range(size)],
+        appointments=[{"title": f"Follow-up {i}", "date": "2025-03-0{}".format(i % 9 + 1), "time": "10:30 AM"} for i in range(size)],
+        fcm_token="f" * 152,
+    ).dict()
+
+
+def medication(index=0):
+    """A realistic MedicationSchema payload without the plaintext fields."""
+    return MedicationSchema(
+        user_id="65f1c2a9e4b0a1b2c3d4e5f6",
+        name=f"Metformin {index}",
+        dosage="500mg",
+        frequency="Twice daily",
+        time="08:00 AM",
+        instructions="Take with food",
+        status="upcoming",
+        refill_date="2025-04-01",
+        low_supply=False,
+        notification=True,
+    ).dict(exclude={"user_id", "status"})
+
+
+def medication_list(count):
+    return [
+        {"_id": str(i), "user_id": "65f1c2a9e4b0a1b2c3d4e5f6", "status": "upcoming", **encryption.encrypt_profile_data(medication(i))}
+        for i in range(count)
+    ]
+
+
+def measure(fn, iterations, warmup=20):
+    """Times `fn` per call and measures bytes allocated per call with tracemalloc."""
+    for _ in range(warmup):
+        fn()
+
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    before, _ = tracemalloc.get_traced_memory()
+    for _ in range(min(iterations, 100)):
+        fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings.sort()
+    mean = statistics.fmean(timings)
+    return {
+        "iterations": iterations,
+        "ops_per_sec": 1 / mean if mean else 0.0,
+        "mean_us": mean * 1e6,
+        "p50_us": timings[len(timings) // 2] * 1e6,
+        "p95_us": timings[int(len(timings) * 0.95) - 1] * 1e6,
+        "p99_us": timings[int(len(timings) * 0.99) - 1] * 1e6,
+        "peak_alloc_bytes": max(peak - before, 0),
+    }
+
+
+def build_cases():
+    """(name, callable) pairs covering every public encryption entry point."""
+    cases = []
+
+    plain = "Metformin 500mg"
+    cipher = encryption.encrypt_data(plain)
+    cases.append(("encrypt_data", lambda: encryption.encrypt_data(plain)))
+    cases.append(("decrypt_data", lambda: encryption.decrypt_data(cipher)))
+    cases.append(("convert_to_original_type", lambda: encryption.convert_to_original_type("500")))
+
+    med = medication()
+    encrypted_med = encryption.encrypt_profile_data(med)
+    sealed_med = encryption.seal_document(med)
+    cases.append(("encrypt_profile_data[medication]", lambda: encryption.encrypt_profile_data(med)))
+    cases.append(("decrypt_profile_data[medication]", lambda: encryption.decrypt_profile_data(encrypted_med)))
+    cases.append(("seal_document[medication]", lambda: encryption.seal_document(med)))
+    cases.append(("decrypt_profile_data[medication,sealed]", lambda: encryption.decrypt_profile_data(sealed_med)))
+
+    for size_name, size in SIZES.items():
+        profile = patient_profile(size)
+        encrypted_profile = encryption.encrypt_profile_data(profile)
+        sealed_profile = encryption.seal_document(profile)
+        cases.append((f"encrypt_profile_data[profile,{size_name}]", lambda p=profile: encryption.encrypt_profile_data(p)))
+        cases.append((f"decrypt_profile_data[profile,{size_name}]", lambda p=encrypted_profile: encryption.decrypt_profile_data(p)))
+        cases.append((f"seal_document[profile,{size_name}]", lambda p=profile: encryption.seal_document(p)))
+        cases.append((f"decrypt_profile_data[profile,{size_name},sealed]", lambda p=sealed_profile: encryption.decrypt_profile_data(p)))
+
+    for count in (10, 100):
+        meds = medication_list(count)
+        cases.append((f"decrypt_documents[{count} medications]", lambda m=meds: encryption.decrypt_documents(m)))
+
+    return cases
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return None
+
+
+def compare(results, baseline_path):
+    """Prints the change in mean latency against a previous results file."""
+    with open(baseline_path) as f:
+        baseline = {case["name"]: case for case in json.load(f)["cases"]}
+
+    print(f"\n{'case':55} {'baseline us':>12} {'current us':>12} {'change':>8}")
+    for case in results["cases"]:
+        old = baseline.get(case["name"])
+        if not old:
+            continue
+        change = (case["mean_us"] - old["mean_us"]) / old["mean_us"] * 100
+        print(f"{case['name']:55} {old['mean_us']:12.1f} {case['mean_us']:12.1f} {change:+7.1f}%")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Encryption micro-benchmarks")
+    parser.add_argument("--iterations", type=int, default=1000, help="Timed calls per case")
+    parser.add_argument("--filter", default="", help="Only run cases whose name contains this text")
+    parser.add_argument("--output", help="Write JSON results to this file")
+    parser.add_argument("--compare", help="Compare against a previous JSON results file")
+    args = parser.parse_args(argv)
+
+    results = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {
+            "encryption_format": encryption.ENCRYPTION_FORMAT,
+            "ciphertext_encoding": encryption.CIPHERTEXT_ENCODING,
+            "decrypt_cache_enabled": encryption.DECRYPT_CACHE_ENABLED,
+        },
+        "cases": [],
+    }
+
+    print(f"{'case':55} {'ops/sec':>10} {'p50 us':>9} {'p95 us':>9} {'p99 us':>9} {'alloc B':>9}")
+    for name, fn in build_cases():
+        if args.filter not in name:
+            continue
+        stats = measure(fn, args.iterations)
+        results["cases"].append({"name": name, **stats})
+        print(f"{name:55} {stats['ops_per_sec']:10.0f} {stats['p50_us']:9.1f} {stats['p95_us']:9.1f} "
+              f"{stats['p99_us']:9.1f} {stats['peak_alloc_bytes']:9d}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
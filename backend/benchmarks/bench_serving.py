@@ -0,0 +1,184 @@
+"""
+Side-by-side throughput of the WSGI and ASGI serving modes.
+
+Starts each server in turn against the same MongoDB (MONGO_URI, a scratch
+database is best), seeds one patient with medications through the API, then
+drives the dashboard endpoints with concurrent clients:
+
+    cd backend
+    python -m benchmarks.bench_serving --concurrency 64 --requests 5000 --output serving.json
+    python -m benchmarks.bench_serving --compare serving.json
+
+The WSGI mode runs under gunicorn with threads, the ASGI mode under uvicorn;
+both use one worker process by default so the numbers are per process.
+"""
+import argparse
+import base64
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+MODES = {
+    "wsgi": ["gunicorn", "--workers", "{workers}", "--threads", "{threads}", "--bind", "127.0.0.1:{port}", "app:create_app()"],
+    "asgi": ["uvicorn", "--factory", "app.asgi:create_asgi_app", "--workers", "{workers}", "--port", "{port}"],
+}
+
+# Dashboard requests, cycled by every client
+ENDPOINTS = [
+    "/medication/summary",
+    "/medication/get?fields=name,time,status",
+    "/medication/upcoming",
+    "/medication/doses",
+]
+
+
+def call(base_url, path, token=None, method="GET", body=None):
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(base_url + path, data=data, method=method)
+    req.add_header("Content-Type", "application/json")
+    if token:
+        req.add_header("Authorization", f"Bearer {token}")
+    with urllib.request.urlopen(req, timeout=30) as response:
+        return response.status, response.read()
+
+
+def wait_until_up(base_url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            call(base_url, "/auth/logout", method="POST", body={})
+        except urllib.error.HTTPError:
+            return  # 401 means the app is serving
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not start")
+
+
+def seed_patient(base_url, medications):
+    """Registers a patient with `medications` medications and returns their token."""
+    email = f"bench-{uuid.uuid4().hex[:8]}@example.com"
+    call(base_url, "/auth/register", method="POST", body={
+        "name": "Bench Patient", "email": email, "phone": "0000000000", "password": "bench-password",
+    })
+    _, body = call(base_url, "/auth/login", method="POST", body={"email": email, "password": "bench-password"})
+    token = json.loads(body)["access_token"]
+
+    call(base_url, "/profile/register", token, method="POST", body={
+        "role": "patient",
+        "profile": {"dateOfBirth": "1955-01-01", "gender": "female", "medicalInfo": {"conditions": ["hypertension"]}},
+    })
+    call(base_url, "/medication/add/bulk", token, method="POST", body=[
+        {
+            "name": f"Medication {i}", "dosage": "10mg", "frequency": "once daily",
+            "time": f"{i % 12 + 1:02d}:00 {'AM' if i % 2 else 'PM'}",
+            "instructions": "With water", "status": "upcoming",
+        }
+        for i in range(medications)
+    ])
+    return token
+
+
+def drive(base_url, token, concurrency, total):
+    """Issues `total` requests from `concurrency` clients; returns (latencies, errors, seconds)."""
+    def one(i):
+        start = time.perf_counter()
+        try:
+            call(base_url, ENDPOINTS[i % len(ENDPOINTS)], token)
+            return time.perf_counter() - start, False
+        except (urllib.error.URLError, OSError):
+            return time.perf_counter() - start, True
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(total)))
+    elapsed = time.perf_counter() - start
+    return [latency for latency, _ in results], sum(error for _, error in results), elapsed
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def run_mode(mode, args, env):
+    command = [part.format(workers=args.workers, threads=args.threads, port=args.port) for part in MODES[mode]]
+    server = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        wait_until_up(base_url)
+        token = seed_patient(base_url, args.medications)
+        drive(base_url, token, args.concurrency, min(args.requests, 200))  # Warm up
+        latencies, errors, elapsed = drive(base_url, token, args.concurrency, args.requests)
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+    return {
+        "mode": mode,
+        "requests_per_sec": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "errors": errors,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="WSGI vs ASGI throughput on the dashboard endpoints")
+    parser.add_argument("--modes", default="wsgi,asgi", help="Comma-separated modes to run")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent clients")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per mode")
+    parser.add_argument("--medications", type=int, default=15, help="Medications seeded for the patient")
+    parser.add_argument("--workers", type=int, default=1, help="Server worker processes")
+    parser.add_argument("--threads", type=int, default=8, help="Threads per WSGI worker")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--output", help="Write JSON results to this file")
+    parser.add_argument("--compare", help="Compare against a previous JSON results file")
+    args = parser.parse_args(argv)
+
+    env = {
+        **os.environ,
+        "ENCRYPTION_KEY": os.environ.get("ENCRYPTION_KEY") or base64.b64encode(os.urandom(32)).decode(),
+        "HMAC_KEY": os.environ.get("HMAC_KEY") or base64.b64encode(os.urandom(32)).decode(),
+        "SECRET_KEY": os.environ.get("SECRET_KEY") or "bench-secret",
+        "MONGO_URI": os.environ.get("MONGO_URI") or "mongodb://localhost:27017/medbuddy_bench",
+        "START_SCHEDULER": "false",
+        "SLOW_REQUEST_MS": "0",
+    }
+
+    results = {"python": sys.version.split()[0], "concurrency": args.concurrency, "cases": []}
+    print(f"{'mode':6} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for mode in args.modes.split(","):
+        case = run_mode(mode, args, env)
+        results["cases"].append(case)
+        print(f"{mode:6} {case['requests_per_sec']:9.1f} {case['p50_ms']:8.1f} {case['p95_ms']:8.1f} "
+              f"{case['p99_ms']:8.1f} {case['errors']:7d}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = {case["mode"]: case for case in json.load(f)["cases"]}
+        print(f"\n{'mode':6} {'baseline req/s':>15} {'current req/s':>14} {'change':>8}")
+        for case in results["cases"]:
+            old = baseline.get(case["mode"])
+            if old:
+                change = (case["requests_per_sec"] - old["requests_per_sec"]) / old["requests_per_sec"] * 100
+                print(f"{case['mode']:6} {old['requests_per_sec']:15.1f} {case['requests_per_sec']:14.1f} {change:+7.1f}%")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
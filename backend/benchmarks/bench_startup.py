@@ -0,0 +1,96 @@
+"""
+Startup-time benchmark: cold import of the app modules and create_app() latency.
+
+Every sample runs in a fresh interpreter so nothing is cached between runs:
+
+    cd backend
+    python -m benchmarks.bench_startup --output startup.json
+    python -m benchmarks.bench_startup --compare startup.json
+
+Also reports the number of threads alive after each step, which should stay
+at 1 for plain imports now that nothing starts at import time.
+"""
+import argparse
+import base64
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+CASES = {
+    "import app": "import app",
+    "import app.utils.encryption": "import app.utils.encryption",
+    "import app.utils.status_updater": "import app.utils.status_updater",
+    "import app.utils.firebase_config": "import app.utils.firebase_config",
+    "create_app()": "from app import create_app; create_app()",
+}
+
+# Runs `code` and prints the elapsed seconds and thread count as JSON
+SNIPPET = """
+import json, threading, time
+start = time.perf_counter()
+{code}
+print(json.dumps({{"seconds": time.perf_counter() - start, "threads": threading.active_count()}}))
+"""
+
+
+def run_sample(code, env):
+    output = subprocess.check_output([sys.executable, "-c", SNIPPET.format(code=code)], env=env, text=True)
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cold import and create_app() benchmark")
+    parser.add_argument("--repeat", type=int, default=10, help="Fresh interpreters per case")
+    parser.add_argument("--output", help="Write JSON results to this file")
+    parser.add_argument("--compare", help="Compare against a previous JSON results file")
+    args = parser.parse_args(argv)
+
+    env = {
+        **os.environ,
+        # Offline: generated keys, no scheduler, no index creation against a live server
+        "ENCRYPTION_KEY": os.environ.get("ENCRYPTION_KEY") or base64.b64encode(os.urandom(32)).decode(),
+        "HMAC_KEY": os.environ.get("HMAC_KEY") or base64.b64encode(os.urandom(32)).decode(),
+        "MONGO_URI": os.environ.get("MONGO_URI") or "mongodb://localhost:27017/medbuddy",
+        "START_SCHEDULER": "false",
+        "CREATE_INDEXES_ON_STARTUP": "false",
+        "INIT_FIREBASE_ON_STARTUP": "false",
+        "PYTHONDONTWRITEBYTECODE": "1",
+    }
+
+    results = {"python": sys.version.split()[0], "cases": []}
+    print(f"{'case':40} {'median ms':>10} {'min ms':>8} {'max ms':>8} {'threads':>8}")
+    for name, code in CASES.items():
+        samples = [run_sample(code, env) for _ in range(args.repeat)]
+        times = [sample["seconds"] * 1000 for sample in samples]
+        case = {
+            "name": name,
+            "median_ms": statistics.median(times),
+            "min_ms": min(times),
+            "max_ms": max(times),
+            "threads": max(sample["threads"] for sample in samples),
+        }
+        results["cases"].append(case)
+        print(f"{name:40} {case['median_ms']:10.1f} {case['min_ms']:8.1f} {case['max_ms']:8.1f} {case['threads']:8d}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = {case["name"]: case for case in json.load(f)["cases"]}
+        print(f"\n{'case':40} {'baseline ms':>12} {'current ms':>11} {'change':>8}")
+        for case in results["cases"]:
+            old = baseline.get(case["name"])
+            if old:
+                change = (case["median_ms"] - old["median_ms"]) / old["median_ms"] * 100
+                print(f"{case['name']:40} {old['median_ms']:12.1f} {case['median_ms']:11.1f} {change:+7.1f}%")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
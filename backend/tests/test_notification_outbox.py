@@ -0,0 +1,111 @@
+"""
+Outbox digests against a real MongoDB (TEST_MONGO_URI, default a local
+scratch database); skipped when none is reachable.
+
+    cd backend && python -m pytest tests
+"""
+import os
+from datetime import datetime, timedelta, timezone
+import pytest
+
+pymongo = pytest.importorskip("pymongo")
+pytest.importorskip("flask")
+
+TEST_MONGO_URI = os.getenv("TEST_MONGO_URI", "mongodb://localhost:27017/medbuddy_test")
+GROUP_KEY = "missed:patient:caregiver"
+TOKEN = "device-token"
+
+
+@pytest.fixture
+def app():
+    try:
+        pymongo.MongoClient(TEST_MONGO_URI, serverSelectionTimeoutMS=500).admin.command("ping")
+    except pymongo.errors.PyMongoError:
+        pytest.skip(f"No MongoDB at {TEST_MONGO_URI}")
+
+    from app import create_app
+    from app.database import mongo
+    from app.utils.indexes import ensure_indexes
+    from app.utils.notification_outbox import register_renderer
+
+    app = create_app({
+        "MONGO_URI": TEST_MONGO_URI,
+        "START_SCHEDULER": False,
+        "LOAD_KEYS_ON_STARTUP": False,
+        "CREATE_INDEXES_ON_STARTUP": False,
+        "METRICS_ENABLED": False,
+    })
+    register_renderer("test", lambda entry: ("Digest", f"{len(entry['items'])} items", {}))
+    with app.app_context():
+        mongo.db.notification_outbox.drop()
+        mongo.db.notifications.drop()
+        ensure_indexes(["notification_outbox"])
+        yield app
+        mongo.db.notification_outbox.drop()
+        mongo.db.notifications.drop()
+
+
+def enqueue(item):
+    from app.utils.notification_outbox import enqueue_coalesced
+    enqueue_coalesced(GROUP_KEY, TOKEN, "test", item, {}, {"patient_id": "patient", "caregiver_id": "caregiver"})
+
+
+def make_due():
+    from app.database import mongo
+    mongo.db.notification_outbox.update_many(
+        {}, {"$set": {"next_attempt_at": datetime.now(timezone.utc) - timedelta(seconds=1)}}
+    )
+
+
+def test_reclaiming_a_digest_while_a_newer_one_is_open(app):
+    from app.database import mongo
+    from app.utils.notification_outbox import dispatch_outbox, OUTBOX_CLAIM_TIMEOUT_SECONDS
+    from app.utils.push_transport import FakeTransport
+
+    # The first digest was claimed by a dispatcher that died mid-send...
+    enqueue({"n": 1})
+    mongo.db.notification_outbox.update_many({}, {"$set": {
+        "status": "sending",
+        "claimed_at": datetime.now(timezone.utc) - timedelta(seconds=OUTBOX_CLAIM_TIMEOUT_SECONDS + 1),
+    }})
+    # ...and a new item meanwhile opened a second digest for the same group
+    enqueue({"n": 2})
+    assert mongo.db.notification_outbox.count_documents({"group_key": GROUP_KEY}) == 2
+
+    make_due()
+    transport = FakeTransport()
+    assert dispatch_outbox(transport) == 2
+    assert len(transport.sent) == 2
+    assert mongo.db.notification_outbox.count_documents({"status": "sent"}) == 2
+    assert mongo.db.notifications.count_documents({}) == 2
+
+
+def test_deferring_a_digest_while_a_newer_one_is_open(app, monkeypatch):
+    from app.database import mongo
+    from app.utils import notification_outbox
+    from app.utils.push_transport import FakeTransport
+
+    enqueue({"n": 1})
+    make_due()
+
+    # The device is over its rate limit, and a new item arrives while the
+    # first digest is "sending"
+    def over_limit(tokens, now):
+        enqueue({"n": 2})
+        return {token: notification_outbox.DEVICE_RATE_LIMIT for token in tokens}
+
+    monkeypatch.setattr(notification_outbox, "_recent_send_counts", over_limit)
+    transport = FakeTransport()
+    assert notification_outbox.dispatch_outbox(transport) == 1
+    assert transport.sent == []
+
+    deferred = mongo.db.notification_outbox.find_one({"status": "deferred"})
+    assert deferred["items"] == [{"n": 1}]
+    open_digest = mongo.db.notification_outbox.find_one({"status": "pending", "attempts": 0})
+    assert open_digest["items"] == [{"n": 2}]
+
+    # Both are sent once the device is below its limit again
+    monkeypatch.setattr(notification_outbox, "_recent_send_counts", lambda tokens, now: {})
+    make_due()
+    assert notification_outbox.dispatch_outbox(transport) == 2
+    assert len(transport.sent) == 2